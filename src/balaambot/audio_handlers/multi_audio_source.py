@@ -1,23 +1,69 @@
 import array
 import asyncio
+import contextlib
 import logging
-import shutil
+import operator
+import struct
 import subprocess
 import threading
 import uuid
-from collections.abc import Callable
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
 from math import sqrt
 from pathlib import Path
-from typing import TypedDict
+from typing import IO, TypedDict, cast
 
 from discord import AudioSource
 
 from balaambot.config import DISCORD_VOICE_CLIENT
+from balaambot.utils import FFMPEG_BIN
 
 logger = logging.getLogger(__name__)
 
+# Bounds of a signed 16-bit PCM sample
+_INT16_RANGE = (-32768, 32767)
+
 # Keep one mixer per guild
 _mixers: dict[int, "MultiAudioSource"] = {}
+# Makes the check-and-create in ensure_mixer atomic across threads
+_mixers_lock = threading.Lock()
+
+# How many decoded sound effects to keep around for replaying
+DECODED_SFX_CACHE_SIZE = 32
+# ...and how much PCM they can hold between them, about 5 minutes at 48kHz stereo
+DECODED_SFX_CACHE_BYTES = 64 * 1024 * 1024
+# Recently decoded sound effect PCM, keyed on file path and mtime, oldest first
+_decoded_sfx: OrderedDict[tuple[str, int], bytes] = OrderedDict()
+# Filled from decoder threads, so guard it
+_decoded_sfx_lock = threading.Lock()
+
+
+def _recall_decoded_sfx(key: tuple[str, int]) -> bytes | None:
+    """Look up cached sound effect PCM, marking it as recently played."""
+    with _decoded_sfx_lock:
+        pcm = _decoded_sfx.get(key)
+        if pcm is not None:
+            _decoded_sfx.move_to_end(key)
+        return pcm
+
+
+def _remember_decoded_sfx(key: tuple[str, int], pcm: bytes) -> None:
+    """Cache decoded sound effect PCM, evicting the least recently played.
+
+    Anything too big for the byte budget on its own isn't kept at all.
+    """
+    if len(pcm) > DECODED_SFX_CACHE_BYTES:
+        return
+    with _decoded_sfx_lock:
+        _decoded_sfx[key] = pcm
+        _decoded_sfx.move_to_end(key)
+        total = sum(map(len, _decoded_sfx.values()))
+        while (
+            len(_decoded_sfx) > DECODED_SFX_CACHE_SIZE
+            or total > DECODED_SFX_CACHE_BYTES
+        ):
+            _, evicted = _decoded_sfx.popitem(last=False)
+            total -= len(evicted)
 
 
 def ensure_mixer(vc: DISCORD_VOICE_CLIENT) -> "MultiAudioSource":
@@ -35,27 +81,54 @@ def ensure_mixer(vc: DISCORD_VOICE_CLIENT) -> "MultiAudioSource":
 
     """
     gid = vc.guild.id
-    if gid not in _mixers:
-        mixer = MultiAudioSource(vc=vc)
-        vc.play(mixer, signal_type="music")  # start the background mixer thread
-        _mixers[gid] = mixer
-        logger.info("Created mixer for guild %s", gid)
-    return _mixers[gid]
+    # Coroutines can't interleave here, but callers on other threads can. Without
+    # the lock, two of them could both start a mixer on the same voice client.
+    with _mixers_lock:
+        mixer = _mixers.get(gid)
+        if mixer is None:
+            mixer = MultiAudioSource(vc=vc)
+            vc.play(mixer, signal_type="music")  # start the background mixer thread
+            _mixers[gid] = mixer
+            logger.info("Created mixer for guild %s", gid)
+    return mixer
+
+
+def _pcm_samples(pcm: bytes) -> memoryview:
+    """View raw 16-bit PCM as samples, without copying it into an array."""
+    return memoryview(pcm).cast("h")
+
 
+def _int16_copy(samples: Sequence[int]) -> array.array[int]:
+    """Copy samples into an int16 array, as a straight memcpy where possible."""
+    out = array.array("h")
+    try:
+        out.frombytes(samples)  # type: ignore[arg-type]
+    except TypeError:
+        # Not a buffer, e.g. a plain list
+        out.extend(samples)
+    return out
 
-class Track(TypedDict):
+
+class _TrackState(TypedDict, total=False):
+    """Keys only set on some tracks. See Track."""
+
+    decoding: bool
+
+
+class Track(_TrackState):
     """A representation of an audio track in the mixer.
 
     Attributes:
-        samples: An array of PCM samples (int16) for playback.
+        samples: The PCM samples (int16) for playback.
         pos: The current read position in the samples array.
         after_play: Optional callback invoked when playback completes.
+        decoding: True while ffmpeg is still appending to ``samples``.
 
     """
 
     id: uuid.UUID
     name: str
-    samples: array.array[int]
+    samples: Sequence[int]
     pos: int
     before_play: Callable[[], None] | None
     after_play: Callable[[], None] | None
@@ -75,6 +148,20 @@ class MultiAudioSource(AudioSource):
     CHUNK_SIZE = int(SAMPLE_RATE * CHANNELS * BYTE_SIZE * CHUNK_DURATION)
     MIN_VOLUME = -32768
     MAX_VOLUME = 32767
+    # What read() sends while playing with nothing queued, shared between calls
+    _SILENCE = bytes(CHUNK_SIZE)
+    # Bytes of decoded PCM to take from ffmpeg at a time in play_file
+    STREAM_READ_SIZE = 64 * 1024
+    # ffmpeg output options for play_file, built once
+    _FFMPEG_OUTPUT_ARGS = (
+        "-f",
+        "s16le",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-ac",
+        str(CHANNELS),
+        "pipe:1",
+    )
 
     # Audio normalisation
     # The intent here is to make loud and quiet tracks somewhat more consistent,
@@ -241,7 +328,7 @@ class MultiAudioSource(AudioSource):
                     "Failed to schedule %s callback for track %s", which, track["name"]
                 )
 
-    def _mix_samples(self) -> array.array[int]:
+    def _mix_samples(self) -> array.array[int] | None:
         """Combine PCM data from all active tracks and sound effects.
 
         Iterates through each track, extracts the next chunk of samples,
@@ -249,52 +336,83 @@ class MultiAudioSource(AudioSource):
         advances track positions, and invokes any completion callbacks.
 
         Returns:
-            An array of mixed 32-bit sample sums for the next output chunk.
+            An array of mixed 32-bit sample sums for the next output chunk, or None
+            if nothing is queued. A lone unscaled stream is already valid int16, so
+            it comes back as an int16 array ("h") of the samples as they are.
 
         """
-        total = array.array("i", [0] * (self.CHUNK_SIZE // 2))
+        if not self._tracks and not self._sfx:
+            return None
+
+        n_samples = self.CHUNK_SIZE // 2
+        streams = self._tracks + self._sfx
+        # One stream at the default limits can't need clipping, so it is copied
+        # straight out instead of being summed and packed. That's most of the time.
+        solo = len(streams) == 1 and (self.MIN_VOLUME, self.MAX_VOLUME) == _INT16_RANGE
+        solo_chunk: array.array[int] | None = None
+        # Python ints can't overflow, so sum into a plain list and only pack it
+        # into an int32 array at the end
+        total = [0] * n_samples
         new_tracks: list[Track] = []
         new_sfx: list[Track] = []
 
-        for track in self._tracks + self._sfx:
+        for track in streams:
             samples = track["samples"]
             pos = track["pos"]
             end = pos + (self.CHUNK_SIZE // 2)
+            decoding = track.get("decoding", False)
+
+            if decoding and pos >= len(samples):
+                # ffmpeg hasn't caught up yet, so there's nothing to play this time
+                self._keep_track(track, new_tracks, new_sfx)
+                continue
 
             if pos == 0:
                 self.handle_callback(track, "before_play")
 
-            if end > len(samples):
-                pad = array.array("h", [0] * (end - len(samples)))
-                samples.extend(pad)
-
-            norm_factor = 1
+            # Short at the end of the track; the rest of the chunk stays silent
+            chunk = samples[pos:end]
             if self.normalise_audio and track["id"] in self._track_norm_factors:
                 norm_factor = self._track_norm_factors[track["id"]]
-
-            chunk = samples[pos:end]
-            for i, s in enumerate(chunk):
-                total[i] += (
-                    # Clamp to within MIN and MAX
+                # Clamp to within MIN and MAX
+                chunk = [
                     max(self.MIN_VOLUME, min(int(s * norm_factor), self.MAX_VOLUME))
-                )
-            track["pos"] = end
-
-            if end >= len(samples):
+                    for s in chunk
+                ]
+            elif solo:
+                solo_chunk = _int16_copy(chunk)
+            if solo_chunk is None:
+                # int16 samples are already in range, so unscaled chunks are added
+                # as they are, without a Python-level loop
+                total[: len(chunk)] = map(operator.add, total, chunk)
+            # Mid-decode, a short chunk means more samples are still to come
+            track["pos"] = pos + len(chunk) if decoding else end
+
+            if not decoding and end >= len(samples):
                 # Finished with playback on this track.
                 self.handle_callback(track, "after_play")
                 # Clean up the normalisation factors dictionary.
                 self._track_norm_factors.pop(track["id"], None)
             else:
                 # Continue playing
-                if track in self._tracks:
-                    new_tracks.append(track)
-                if track in self._sfx:
-                    new_sfx.append(track)
+                self._keep_track(track, new_tracks, new_sfx)
 
         self._tracks = new_tracks
         self._sfx = new_sfx
-        return total
+        if solo_chunk is not None:
+            # Pad a short final chunk with silence
+            solo_chunk.frombytes(bytes(self.BYTE_SIZE * (n_samples - len(solo_chunk))))
+            return solo_chunk
+        return array.array("i", total)
+
+    def _keep_track(
+        self, track: Track, new_tracks: list[Track], new_sfx: list[Track]
+    ) -> None:
+        """Carry a track over into the next chunk's track lists."""
+        if track in self._tracks:
+            new_tracks.append(track)
+        if track in self._sfx:
+            new_sfx.append(track)
 
     def read(self) -> bytes:
         """Provide the next PCM audio chunk for Discord to send.
@@ -312,17 +430,31 @@ class MultiAudioSource(AudioSource):
 
         with self._lock:
             mixed = self._mix_samples()
-
-        out = array.array("h", [0] * (self.CHUNK_SIZE // 2))
-        for i, val in enumerate(mixed):
-            if val > self.MAX_VOLUME:
-                out[i] = self.MAX_VOLUME
-            elif val < self.MIN_VOLUME:
-                out[i] = self.MIN_VOLUME
-            else:
-                out[i] = val
-
-        return out.tobytes()
+        if mixed is None:
+            # Idle but still connected: don't build a fresh chunk of zeros each tick
+            return self._SILENCE
+        if mixed.typecode == "h":
+            # Already int16 PCM, with nothing to clip
+            return mixed.tobytes()
+
+        pcm_format = f"{len(mixed)}h"
+        lo, hi = self.MIN_VOLUME, self.MAX_VOLUME
+        if (lo, hi) == _INT16_RANGE:
+            # Packing as int16 rejects anything out of range, which with the
+            # default limits is exactly when clipping is needed. Mixes rarely
+            # overflow, so try that first and only clip sample by sample if not.
+            with contextlib.suppress(struct.error):
+                return struct.pack(pcm_format, *mixed)
+
+        return struct.pack(pcm_format, *[min(max(v, lo), hi) for v in mixed])
+
+    def cleanup(self) -> None:
+        """Drop queued sound effects once discord.py stops playing the mixer.
+
+        Nothing will read them any more, and dropping them stops any ffmpeg
+        processes still decoding them.
+        """
+        self.clear_sfx()
 
     def clear_queue(self) -> None:
         """Stop all playback and clear both music tracks and sound effects."""
@@ -367,9 +499,7 @@ class MultiAudioSource(AudioSource):
             msg = f"{file_path!r} does not exist"
             raise FileNotFoundError(msg)
 
-        pcm = file_path.read_bytes()
-        samples = array.array("h")
-        samples.frombytes(pcm)
+        samples = _pcm_samples(file_path.read_bytes())
 
         with self._lock:
             track = Track(
@@ -394,8 +524,10 @@ class MultiAudioSource(AudioSource):
     ) -> None:
         """Decode an audio file via ffmpeg and enqueue it for mixing.
 
-        Uses ffmpeg to convert the specified file into 16-bit 48kHz stereo PCM,
-        reads the output, and adds the samples to the mixer queue.
+        Uses ffmpeg to convert the specified file into 16-bit 48kHz stereo PCM.
+        The track is queued straight away and a background thread feeds it
+        ffmpeg's output as it's decoded, so playback doesn't wait for the whole
+        file and the caller isn't blocked on ffmpeg.
 
         Args:
             filename: Path to the audio file to play.
@@ -404,60 +536,123 @@ class MultiAudioSource(AudioSource):
 
         Raises:
             FileNotFoundError: If the file does not exist.
-            RuntimeError: If ffmpeg is not installed or decoding fails.
+            RuntimeError: If ffmpeg is not installed.
 
         """
         logger.info("Playing file %s", filename)
 
-        if not Path(filename).is_file():
+        path = Path(filename)
+        if not path.is_file():
             msg = f"{filename!r} does not exist"
             raise FileNotFoundError(msg)
 
-        ffmpeg_path = shutil.which("ffmpeg")
-        if ffmpeg_path is None:
+        # Sound effects get replayed a lot, so skip ffmpeg if we've decoded this
+        # version of the file recently
+        cache_key = (filename, path.stat().st_mtime_ns)
+        pcm = _recall_decoded_sfx(cache_key)
+        if pcm is not None:
+            self._queue_sfx(filename, _pcm_samples(pcm), before_play, after_play)
+            return
+
+        if FFMPEG_BIN is None:
             msg = "ffmpeg not found in PATH"
             raise RuntimeError(msg)
 
         proc = subprocess.Popen(  # noqa: S603 We're safe here
-            [
-                ffmpeg_path,
-                "-v",
-                "quiet",
-                "-i",
-                filename,
-                "-f",
-                "s16le",
-                "-ar",
-                str(self.SAMPLE_RATE),
-                "-ac",
-                str(self.CHANNELS),
-                "pipe:1",
-            ],
+            [FFMPEG_BIN, "-v", "quiet", "-i", filename, *self._FFMPEG_OUTPUT_ARGS],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
         )
 
-        pcm_data, err = proc.communicate()
-        if proc.returncode != 0:
-            msg = f"ffmpeg failed: {err.decode(errors='ignore')}"
-            raise RuntimeError(msg)
-
         samples = array.array("h")
-        samples.frombytes(pcm_data)
+        track = self._queue_sfx(
+            filename, samples, before_play, after_play, decoding=True
+        )
+
+        threading.Thread(
+            target=self._stream_pcm,
+            args=(proc, track, samples, cache_key),
+            name=f"ffmpeg-{track['id']}",
+            daemon=True,
+        ).start()
 
+    def _queue_sfx(
+        self,
+        name: str,
+        samples: Sequence[int],
+        before_play: Callable[[], None] | None,
+        after_play: Callable[[], None] | None,
+        *,
+        decoding: bool = False,
+    ) -> Track:
+        """Add a sound effect track to the mixer and start playback."""
         with self._lock:
             track = Track(
                 id=uuid.uuid4(),
-                name=filename,
+                name=name,
                 samples=samples,
                 pos=0,
                 before_play=before_play,
                 after_play=after_play,
+                decoding=decoding,
             )
             self._sfx.append(track)
 
         self.resume()
         logger.info("There are now %d tracks in the mixer", len(self._sfx))
+        return track
+
+    def _stream_pcm(
+        self,
+        proc: subprocess.Popen[bytes],
+        track: Track,
+        samples: array.array[int],
+        cache_key: tuple[str, int],
+    ) -> None:
+        """Append ffmpeg's PCM output to a queued track as it arrives.
+
+        If ffmpeg fails part way, the track just ends with whatever was decoded.
+        If the track is removed from the mixer first, ffmpeg is killed. Otherwise
+        the decoded audio is kept for the next time the file is played.
+        """
+        stdout = cast("IO[bytes]", proc.stdout)
+        stderr = cast("IO[bytes]", proc.stderr)
+        # Read every block into the same buffer, rather than a new bytes each time
+        buf = memoryview(bytearray(self.STREAM_READ_SIZE))
+        carry = 0
+        try:
+            while n_read := stdout.readinto(buf[carry:]):  # type: ignore[attr-defined]
+                filled = carry + n_read
+                usable = filled - filled % self.BYTE_SIZE
+                with self._lock:
+                    dropped = not any(t is track for t in self._sfx)
+                    if not dropped:
+                        samples.frombytes(buf[:usable])
+                if dropped:
+                    self._stop_decoding(proc, track)
+                    return
+                # Pipe reads can split a sample; hold the odd byte for next time
+                carry = filled - usable
+                buf[:carry] = buf[usable:filled]
+            err = stderr.read()
+            if proc.wait() == 0:
+                _remember_decoded_sfx(cache_key, samples.tobytes())
+            else:
+                logger.error(
+                    "ffmpeg failed on %s: %s",
+                    track["name"],
+                    err.decode(errors="ignore"),
+                )
+        finally:
+            with self._lock:
+                track["decoding"] = False
+
+    @staticmethod
+    def _stop_decoding(proc: subprocess.Popen[bytes], track: Track) -> None:
+        """Kill the ffmpeg process decoding a track that's no longer queued."""
+        logger.info("Stopped decoding %s, it was removed from the mixer", track["name"])
+        proc.kill()
+        proc.wait()
 
     def skip_current_tracks(self) -> None:
         """Immediately end playback of all current tracks and trigger callbacks.
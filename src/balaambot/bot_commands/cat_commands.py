@@ -22,6 +22,10 @@ class CatCommands(commands.Cog):
         self.bot = bot
         self.cat_handler = CatHandler()
 
+    async def cog_unload(self) -> None:
+        """Make sure no cat changes are lost when the cog is unloaded."""
+        self.cat_handler.flush()
+
     @app_commands.command(name="adopt", description="Adopt a new cat for the server!")
     @app_commands.describe(cat="The name of the cat to adopt")
     async def adopt_cat(self, interaction: discord.Interaction, cat: str) -> None:
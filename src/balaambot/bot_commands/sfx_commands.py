@@ -87,9 +87,12 @@ class SFXCommands(commands.Cog):
             return
 
         jobs: list[str] = []
-        for jid, (vc, _task, sound, mi, ma) in audio_sfx_jobs.loop_jobs.items():
-            if vc.guild.id == guild.id:
-                jobs.append(f"`{jid}`: `{sound}` every {mi:.1f}-{ma:.1f}s")
+        for jid, job in audio_sfx_jobs.loop_jobs.items():
+            if job.vc.guild.id == guild.id:
+                jobs.append(
+                    f"`{jid}`: `{job.sound}` every "
+                    f"{job.min_interval:.1f}-{job.max_interval:.1f}s"
+                )
 
         if not jobs:
             await interaction.response.send_message(
@@ -38,8 +38,15 @@ async def on_ready() -> None:
     logger.info("Logged in as %s", bot.user)
 
 
-async def load_extensions() -> None:
-    """Load all the available bot extensions."""
+async def load_extensions(client: commands.Bot | None = None) -> None:
+    """Load all the available bot extensions.
+
+    Args:
+        client (commands.Bot | None): The bot to load them onto. Defaults to ``bot``.
+
+    """
+    if client is None:
+        client = bot
     commands_path = pathlib.Path(__file__).parent / "bot_commands"
     extension_files = sorted(commands_path.glob("*.py"), key=lambda f: f.name)
     if len(extension_files) == 0:
@@ -51,18 +58,32 @@ async def load_extensions() -> None:
         if ext_file.name != "__init__.py":
             ext_path = f"balaambot.bot_commands.{ext_file.stem}"
             logger.info("Loading extension: %s", ext_path)
-            await bot.load_extension(ext_path)
+            await client.load_extension(ext_path)
+
 
+def add_listeners(client: commands.Bot | None = None) -> None:
+    """Add listeners to the bot.
 
-def add_listeners() -> None:
-    """Add listeners to the bot."""
-    bot.add_listener(on_voice_state_update, "on_voice_state_update")
+    Args:
+        client (commands.Bot | None): The bot to add them to. Defaults to ``bot``.
+
+    """
+    if client is None:
+        client = bot
+    client.add_listener(on_voice_state_update, "on_voice_state_update")
 
     logger.info("Added listeners to the bot.")
 
 
-async def main() -> None:
-    """Main async process that runs the bot."""
+async def main(client: commands.Bot | None = None) -> None:
+    """Main async process that runs the bot.
+
+    Args:
+        client (commands.Bot | None): The bot to start. Defaults to ``bot``.
+
+    """
+    if client is None:
+        client = bot
     # Check the token is valid
     if DISCORD_BOT_TOKEN is None or DISCORD_BOT_TOKEN == "":
         msg = "DISCORD_BOT_TOKEN environment variable is not set."
@@ -74,12 +95,12 @@ async def main() -> None:
         )
         raise ValueError(msg)
     logger.info("Starting bot...")
-    async with bot:
+    async with client:
         # Loads all files in bot_commands
-        await load_extensions()
-        add_listeners()
+        await load_extensions(client)
+        add_listeners(client)
         # Start the bot
-        await bot.start(DISCORD_BOT_TOKEN)
+        await client.start(DISCORD_BOT_TOKEN)
 
 
 def start() -> None:
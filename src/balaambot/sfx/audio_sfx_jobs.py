@@ -1,5 +1,6 @@
 import asyncio
 import contextlib
+import dataclasses
 import logging
 import random
 import uuid
@@ -16,28 +17,56 @@ logger.info(
     "Loaded %d sound files from %s", len(SOUND_FILES), Path("sounds").absolute()
 )
 
-# Track active jobs:
-#   job_id -> (VoiceClient, asyncio.Task, sound_file, min_interval, max_interval)
-loop_jobs: dict[
-    str,
-    tuple[discord_utils.DISCORD_VOICE_CLIENT, asyncio.Task[None], str, float, float],
-] = {}
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class LoopJob:
+    """An active SFX job: which sound to play where, and how often."""
+
+    vc: discord_utils.DISCORD_VOICE_CLIENT
+    task: asyncio.Task[None]
+    sound: str
+    min_interval: float
+    max_interval: float
+    # Set when the job is dropped, so its loop stops without polling loop_jobs
+    stop: asyncio.Event = dataclasses.field(default_factory=asyncio.Event)
+
+
+# Track active jobs by job_id
+loop_jobs: dict[str, LoopJob] = {}
+# The job_ids running in each guild, so stopping a guild's jobs doesn't scan them all
+_jobs_by_guild: dict[int, set[str]] = {}
+
+
+def _track_job(job_id: str, job: LoopJob) -> None:
+    loop_jobs[job_id] = job
+    _jobs_by_guild.setdefault(job.vc.guild.id, set()).add(job_id)
+
+
+def _untrack_job(job_id: str) -> None:
+    job = loop_jobs.pop(job_id)
+    job.stop.set()
+    guild_jobs = _jobs_by_guild.get(job.vc.guild.id)
+    if guild_jobs is not None:
+        guild_jobs.discard(job_id)
+        if not guild_jobs:
+            del _jobs_by_guild[job.vc.guild.id]
 
 
 async def _play_sfx_loop(vc: discord_utils.DISCORD_VOICE_CLIENT, job_id: str) -> None:
     """Internal loop: play the given SFX on its own schedule.
 
     This function is run in a separate task and will be cancelled when the
-    job is removed. It will also stop if the voice client disconnects.
+    job is removed. It also stops once the job's stop event is set, or if the
+    voice client disconnects.
     """
     try:
-        while True:
-            data = loop_jobs.get(job_id)
-            if not data:
-                logger.info("SFX job %s not found in guild_id=%s", job_id, vc.guild.id)
-                break
-            _, _, sound, min_interval, max_interval = data
+        job = loop_jobs.get(job_id)
+        if job is None:
+            logger.info("SFX job %s not found in guild_id=%s", job_id, vc.guild.id)
+            return
+        sound = job.sound
 
+        while not job.stop.is_set():
             if not vc.is_connected():
                 logger.info(
                     "SFX job %s: voice client not connected in guild_id=%s",
@@ -47,8 +76,12 @@ async def _play_sfx_loop(vc: discord_utils.DISCORD_VOICE_CLIENT, job_id: str) ->
                 await remove_job(job_id)
                 return
 
-            wait = random.uniform(min_interval, max_interval)  # noqa: S311
-            await asyncio.sleep(wait)
+            wait = random.uniform(job.min_interval, job.max_interval)  # noqa: S311
+            # Sleep until the next play, waking early if the job is stopped
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(job.stop.wait(), timeout=wait)
+            if job.stop.is_set():
+                break
 
             done_event = anyio.Event()
 
@@ -78,7 +111,7 @@ async def add_job(
     """Start a new SFX job for a specific sound and interval; returns job_id."""
     job_id = uuid.uuid4().hex
     task = vc.loop.create_task(_play_sfx_loop(vc, job_id))
-    loop_jobs[job_id] = (vc, task, sound, min_interval, max_interval)
+    _track_job(job_id, LoopJob(vc, task, sound, min_interval, max_interval))
     logger.info(
         "Started SFX job %s for sound %s in guild_id=%s", job_id, sound, vc.guild.id
     )
@@ -87,24 +120,29 @@ async def add_job(
 
 async def remove_job(job_id: str) -> None:
     """Stop and remove the SFX job by its job_id."""
-    data = loop_jobs.get(job_id)
-    if not data:
+    job = loop_jobs.get(job_id)
+    if job is None:
         msg = f"No active job with id {job_id}"
         raise KeyError(msg)
-    vc, task, sound, *_ = data
 
-    task.cancel()
+    job.task.cancel()
     with contextlib.suppress(asyncio.CancelledError):
-        await task
+        await job.task
 
-    del loop_jobs[job_id]
+    _untrack_job(job_id)
     logger.info(
-        "Stopped SFX job %s for sound %s in guild_id=%s", job_id, sound, vc.guild.id
+        "Stopped SFX job %s for sound %s in guild_id=%s",
+        job_id,
+        job.sound,
+        job.vc.guild.id,
     )
 
 
 async def stop_all_jobs(vc: discord_utils.DISCORD_VOICE_CLIENT) -> None:
     """Stop all SFX jobs for the given voice client."""
-    jobs_to_remove = [jid for jid, (j_vc, *_) in loop_jobs.items() if j_vc == vc]
+    # Copy, since remove_job shrinks the set as we go
+    jobs_to_remove = [
+        jid for jid in _jobs_by_guild.get(vc.guild.id, ()) if loop_jobs[jid].vc == vc
+    ]
     for job_id in jobs_to_remove:
         await remove_job(job_id)
@@ -1,9 +1,14 @@
+import asyncio
 import concurrent.futures
-import json
+import contextlib
 import logging
-from collections.abc import Awaitable
-from typing import Any
+import shutil
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Iterator, MutableMapping
+from typing import Any, Generic, TypeVar
 
+import pydantic_core
 import redis
 import redis.exceptions
 
@@ -13,7 +18,85 @@ logger = logging.getLogger(__name__)
 
 FUTURES_EXECUTOR = concurrent.futures.ProcessPoolExecutor()
 
-memory_cache: dict[str, dict] = {}
+# Looked up once, rather than searching PATH for every ffmpeg process
+FFMPEG_BIN = shutil.which("ffmpeg")
+
+# Bounds for the in-memory metadata cache, which also fronts Redis when that's in
+# use. Titles and runtimes don't change often.
+MEMORY_CACHE_MAXSIZE = 10_000
+MEMORY_CACHE_TTL = 60 * 60  # seconds
+
+
+K = TypeVar("K")
+V = TypeVar("V")
+T = TypeVar("T")
+
+
+class TTLCache(MutableMapping[K, V]):
+    """A size-bounded mapping whose entries expire ``ttl`` seconds after being set.
+
+    When full, the least recently used entry is evicted to make room.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create an empty cache holding at most ``maxsize`` entries."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        # key -> (expiry time, value), ordered from least to most recently used
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __getitem__(self, key: K) -> V:
+        """Fetch ``key``, raising KeyError if it's missing or has expired."""
+        expires, value = self._data[key]
+        if expires <= self._timer():
+            del self._data[key]
+            raise KeyError(key)
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        """Store ``value``, evicting the least recently used entries if full."""
+        self._data[key] = (self._timer() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __delitem__(self, key: K) -> None:
+        """Remove ``key`` from the cache."""
+        del self._data[key]
+
+    def __iter__(self) -> Iterator[K]:
+        """Iterate over the keys that haven't expired."""
+        self.expire()
+        return iter(list(self._data))
+
+    def __len__(self) -> int:
+        """Number of entries that haven't expired."""
+        self.expire()
+        return len(self._data)
+
+    def expire(self) -> None:
+        """Drop every expired entry."""
+        now = self._timer()
+        for key in [k for k, (expires, _) in self._data.items() if expires <= now]:
+            del self._data[key]
+
+
+# Values in Redis are compact UTF-8 JSON, so they take less space and bandwidth.
+# pydantic's Rust codec (already installed with pydantic) writes that straight to
+# bytes and parses it from bytes, several times faster than the json module.
+_encode_json = pydantic_core.to_json
+_decode_json = pydantic_core.from_json
+
+memory_cache: TTLCache[str, dict] = TTLCache(
+    maxsize=MEMORY_CACHE_MAXSIZE, ttl=MEMORY_CACHE_TTL
+)
 
 redis_cache = None
 if USE_REDIS:
@@ -52,6 +135,11 @@ async def get_cache(key: str) -> dict[str, Any]:
 
     """
     if redis_cache is not None and USE_REDIS:
+        # Keep a local copy of what we've seen in Redis, to save a round trip and
+        # a decode on repeat lookups. It expires like the memory-only cache.
+        with contextlib.suppress(KeyError):
+            return memory_cache[key]
+
         logger.debug("Fetching '%s' from Redis", key)
         serialised = redis_cache.hget(REDIS_KEY, key)
 
@@ -61,7 +149,9 @@ async def get_cache(key: str) -> dict[str, Any]:
         if not serialised:
             raise KeyError(key)
 
-        return json.loads(serialised)
+        obj = _decode_json(serialised)
+        memory_cache[key] = obj
+        return obj
 
     logger.debug("Fetching '%s' from memory", key)
     return memory_cache[key]
@@ -77,8 +167,9 @@ async def set_cache(key: str, obj: dict[str, Any]) -> None:
     """
     if redis_cache is not None and USE_REDIS:
         logger.debug("Caching '%s' to Redis", key)
-        serialised = json.dumps(obj)
+        serialised = _encode_json(obj)
         redis_cache.hset(REDIS_KEY, key, serialised)
+        memory_cache[key] = obj
         return
 
     logger.debug("Caching '%s' to memory", key)
@@ -86,11 +177,55 @@ async def set_cache(key: str, obj: dict[str, Any]) -> None:
 
 
 def sec_to_string(val: float) -> str:
-    """Convert a number of seconds to a human-readable string, (HH:)MM:SS."""
-    sec_in_hour = 60 * 60
-    d = ""
-    if val >= sec_in_hour:
-        d += f"{int(val // sec_in_hour):02d}:"
-        val = val % sec_in_hour
-    d += f"{int(val // 60):02d}:{int(val % 60):02d}"
-    return d
+    """Convert a number of seconds to a human-readable string, (HH:)MM:SS.
+
+    Fractions of a second are dropped, and negative durations read as zero.
+    """
+    minutes, secs = divmod(max(0, int(val)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+class SingleFlight(Generic[T]):
+    """Collapse concurrent calls for the same key into a single in-flight task.
+
+    The first caller for a key starts the work; anyone else asking for that key
+    while it's running awaits the same result instead of repeating it. Nothing is
+    allocated for keys that aren't in flight, and entries are dropped as soon as
+    the work finishes, so this never grows beyond the number of concurrent keys.
+    """
+
+    def __init__(self) -> None:
+        """Set up the in-flight task registry."""
+        self._inflight: dict[Hashable, asyncio.Future[T]] = {}
+
+    def __len__(self) -> int:
+        """Number of keys currently in flight."""
+        return len(self._inflight)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether work for ``key`` is currently in flight."""
+        return key in self._inflight
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Await ``func()``, sharing the result with concurrent callers of ``key``.
+
+        The shared task is shielded, so one caller being cancelled doesn't cancel
+        the work for everyone else waiting on it.
+        """
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(func())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(fut)
+
+    def clear(self) -> None:
+        """Forget all in-flight keys. Running work is left to finish on its own."""
+        self._inflight.clear()
+
+    def _forget(self, key: Hashable, fut: "asyncio.Future[T]") -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
@@ -12,17 +12,53 @@ from balaambot.youtube import metadata
 from balaambot.youtube.utils import (
     DEFAULT_CHANNELS,
     DEFAULT_SAMPLE_RATE,
+    CacheBackend,
+    FilesystemBackend,
     VideoMetadata,
     cache_get_metadata,
     cache_set_metadata,
     get_cache_path,
     get_temp_paths,
+    metadata_youtube_dl,
 )
 
 logger = logging.getLogger(__name__)
 
-# Locks to prevent multiple simultaneous downloads of the same URL
-_download_locks: dict[str, asyncio.Lock] = {}
+# Deduplicates simultaneous downloads of the same URL
+_download_flights: utils.SingleFlight[Path] = utils.SingleFlight()
+
+# Storage used for the cache checks and file moves below. Swappable for tests.
+_cache_backend: CacheBackend = FilesystemBackend()
+
+# Maximum number of ffmpeg conversions allowed to run at once
+FFMPEG_WORKERS = 2
+
+# Each conversion needs its own ffmpeg process, since ffmpeg exits once its input
+# is exhausted. Capping them stops a long playlist from spawning a decoder per
+# track and starving the mixer of CPU.
+_ffmpeg_slots = asyncio.Semaphore(FFMPEG_WORKERS)
+
+
+async def _run_ffmpeg(*args: str) -> tuple[int | None, bytes]:
+    """Run ffmpeg with ``args`` once one of the ``_ffmpeg_slots`` is free.
+
+    Returns:
+        The process return code and whatever it wrote to stderr.
+
+    """
+    if utils.FFMPEG_BIN is None:
+        msg = "ffmpeg not found in PATH"
+        raise RuntimeError(msg)
+
+    async with _ffmpeg_slots:
+        proc = await asyncio.create_subprocess_exec(
+            utils.FFMPEG_BIN,
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _out, err = await proc.communicate()
+    return proc.returncode, err
 
 
 async def fetch_audio_pcm(
@@ -34,29 +70,52 @@ async def fetch_audio_pcm(
 ) -> Path:
     """Audio fetching. Cache check, download via yt-dlp, then convert to PCM."""
     cache_path = get_cache_path(url, sample_rate, channels)
-    if cache_path.exists():
+    if _cache_backend.exists(cache_path):
         return cache_path
 
-    lock = _download_locks.setdefault(url, asyncio.Lock())
-    async with lock:
-        if cache_path.exists():
-            return cache_path
+    # Flights are keyed on the URL because the temp files are too. If we joined a
+    # download for different audio parameters, go round again for our own.
+    fetched = await _download_flights.run(
+        url,
+        lambda: _download_to_cache(
+            url,
+            cache_path,
+            sample_rate,
+            channels,
+            username=username,
+            password=password,
+        ),
+    )
+    if fetched != cache_path:
+        return await fetch_audio_pcm(url, sample_rate, channels, username, password)
+    return fetched
+
 
-        opus_tmp, pcm_tmp = get_temp_paths(url)
+async def _download_to_cache(  # noqa: PLR0913
+    url: str,
+    cache_path: Path,
+    sample_rate: int,
+    channels: int,
+    *,
+    username: str | None,
+    password: str | None,
+) -> Path:
+    """Download ``url`` and convert it into ``cache_path``, unless it's there."""
+    if _cache_backend.exists(cache_path):
+        return cache_path
 
-        try:
-            await asyncio.gather(
-                _download_opus(url, opus_tmp, username=username, password=password),
-                metadata.get_youtube_track_metadata(url),
-            )
-        except DownloadError as e:
-            logger.exception("yt-dlp failed to download %s", url)
-            msg = f"Failed to download audio for {url}"
-            raise RuntimeError(msg) from e
+    opus_tmp, pcm_tmp = get_temp_paths(url)
 
-        await _convert_opus_to_pcm(opus_tmp, pcm_tmp, cache_path, sample_rate, channels)
+    try:
+        await _download_opus(url, opus_tmp, username=username, password=password)
+    except DownloadError as e:
+        logger.exception("yt-dlp failed to download %s", url)
+        msg = f"Failed to download audio for {url}"
+        raise RuntimeError(msg) from e
 
-        return cache_path
+    await _convert_opus_to_pcm(opus_tmp, pcm_tmp, cache_path, sample_rate, channels)
+
+    return cache_path
 
 
 # Helper for when running blocking download in thread
@@ -99,10 +158,10 @@ async def _download_opus(
     await loop.run_in_executor(utils.FUTURES_EXECUTOR, _sync_download, ydl_opts, url)
 
     final_opus = opus_tmp.with_suffix(".opus")
-    if not final_opus.exists():
+    if not _cache_backend.exists(final_opus):
         msg = f"yt-dlp failed to produce {final_opus}"
         raise RuntimeError(msg)
-    final_opus.replace(opus_tmp)
+    _cache_backend.move(final_opus, opus_tmp)
 
 
 async def _convert_opus_to_pcm(
@@ -112,35 +171,36 @@ async def _convert_opus_to_pcm(
     sample_rate: int,
     channels: int,
 ) -> None:
-    """Convert a downloaded opus file to PCM and move to cache."""
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        str(opus_tmp),
-        "-f",
-        "s16le",
-        "-acodec",
-        "pcm_s16le",
-        "-ac",
-        str(channels),
-        "-ar",
-        str(sample_rate),
-        str(pcm_tmp),
-    ]
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    _out, err = await proc.communicate()
-    opus_tmp.unlink(missing_ok=True)
-    if proc.returncode != 0:
-        pcm_tmp.unlink(missing_ok=True)
+    """Convert a downloaded opus file to PCM and move to cache.
+
+    ffmpeg writes raw s16le straight to ``pcm_tmp``, which is then renamed into
+    place, so none of the audio passes through Python.
+    """
+    try:
+        returncode, err = await _run_ffmpeg(
+            "-y",
+            "-i",
+            str(opus_tmp),
+            "-f",
+            "s16le",
+            "-acodec",
+            "pcm_s16le",
+            "-ac",
+            str(channels),
+            "-ar",
+            str(sample_rate),
+            str(pcm_tmp),
+        )
+    finally:
+        # Don't leave the opus file behind, even if ffmpeg couldn't be started
+        _cache_backend.remove(opus_tmp)
+    if returncode != 0:
+        _cache_backend.remove(pcm_tmp)
         msg = f"ffmpeg failed: {err.decode(errors='ignore')}"
         raise RuntimeError(msg)
 
-    pcm_tmp.replace(cache_path)
+    # Off the event loop: across filesystems the move is a copy of the whole track
+    await asyncio.to_thread(_cache_backend.move, pcm_tmp, cache_path)
 
 
 # === Synchronous wrappers used by worker threads ===
@@ -198,8 +258,10 @@ def download_and_convert(  # noqa: PLR0913
         str(sample_rate),
         str(pcm_tmp),
     ]
-    proc = subprocess.run(cmd, capture_output=True, check=False)  # noqa: S603
-    expected_opus.unlink(missing_ok=True)
+    try:
+        proc = subprocess.run(cmd, capture_output=True, check=False)  # noqa: S603
+    finally:
+        expected_opus.unlink(missing_ok=True)
 
     if proc.returncode != 0:
         pcm_tmp.unlink(missing_ok=True)
@@ -221,15 +283,9 @@ def get_metadata(logger: logging.Logger, url: str) -> VideoMetadata:
             "No metadata in cache for URL. Fetching track metadata for URL: '%s'", url
         )
 
-    ydl_opts = {
-        "quiet": True,
-        "skip_download": True,
-        "extract_flat": True,
-    }
-
     logger.info("Fetching metadata for %s", url)
-    with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)  # type: ignore[no-typing]
+    ydl = metadata_youtube_dl(YoutubeDL)
+    info = ydl.extract_info(url, download=False)  # type: ignore[no-typing]
 
     if not info:
         msg = "Failed to get youtube metadata"
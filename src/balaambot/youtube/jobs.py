@@ -1,7 +1,16 @@
+import asyncio
+import itertools
 import logging
+from collections import deque
 from collections.abc import Callable
 
-from discord.channel import CategoryChannel, ForumChannel
+from discord.channel import (
+    CategoryChannel,
+    ForumChannel,
+    StageChannel,
+    TextChannel,
+    VoiceChannel,
+)
 
 from balaambot import discord_utils, utils
 from balaambot.youtube.download import (
@@ -15,10 +24,14 @@ from balaambot.youtube.utils import get_cache_path, get_temp_paths
 # TODO: This should maintain a "playing" state so we can pause and resume playback
 
 # Mapping from voice client to its queue of YouTube URLs
-# The key is the guild ID, and the value is a list of URLs.
-youtube_queue: dict[int, list[str]] = {}
+# The key is the guild ID, and the value is a deque of URLs, since tracks are
+# taken off the front as they finish.
+youtube_queue: dict[int, deque[str]] = {}
 # Always check that this many tracks in the queue are cached
 QUEUE_FORESIGHT = 3
+# Metadata fetches running alongside playback. The loop only keeps weak references
+# to tasks, so hold on to them until they finish.
+_metadata_warmups: set[asyncio.Task[None]] = set()
 
 logger = logging.getLogger(__name__)
 
@@ -30,70 +43,96 @@ async def add_to_queue(
 
     If nothing is playing, start playback immediately.
     """
-    queue = youtube_queue.setdefault(vc.guild.id, [])
+    gid = vc.guild.id
+    queue = youtube_queue.setdefault(gid, deque())
     queue.append(url)
-    logger.info(
-        "Queued URL %s for guild_id=%s (queue length=%d)", url, vc.guild.id, len(queue)
-    )
+    logger.info("Queued URL %s for guild_id=%s (queue length=%d)", url, gid, len(queue))
 
     # dispatch a subprocess that fetches the metadata
     vc.loop.run_in_executor(utils.FUTURES_EXECUTOR, get_metadata, logger, url)
 
     # If this is the only item, start playback
     if len(queue) == 1:
-        logger.info("Queue created for guild_id=%s, starting playback", vc.guild.id)
+        logger.info("Queue created for guild_id=%s, starting playback", gid)
 
         # Start playback immediately
         try:
             vc.loop.create_task(_play_next(vc, text_channel=text_channel))
         except Exception:
-            logger.exception("Failed to start playback for guild_id=%s", vc.guild.id)
+            logger.exception("Failed to start playback for guild_id=%s", gid)
             # If we fail to start playback, we should clear the queue
-            youtube_queue.pop(vc.guild.id, None)
+            youtube_queue.pop(gid, None)
             raise
 
 
 async def _maybe_preload_next_tracks(
     vc: discord_utils.DISCORD_VOICE_CLIENT,
-    queue: list[str],
+    queue: deque[str],
     foresight: int = QUEUE_FORESIGHT,
 ) -> None:
     logger.info("Caching the next %d tracks in the queue...", foresight)
 
-    upcoming = queue[1 : foresight + 1]  # skip the currently playing track
+    # skip the currently playing track. A track queued twice is only fetched once,
+    # since concurrent downloads of one URL would share the same temp files.
+    upcoming = list(dict.fromkeys(itertools.islice(queue, 1, foresight + 1)))
 
     for url in upcoming:
         logger.info("  - Caching %s", url)
 
+    mixer = discord_utils.get_mixer_from_voice_client(vc)
+    downloads: list[tuple[str, asyncio.Future[None]]] = []
     for url in upcoming:
-        mixer = discord_utils.get_mixer_from_voice_client(vc)
-
         cache_path = get_cache_path(url, mixer.SAMPLE_RATE, mixer.CHANNELS)
         if cache_path.exists():
             continue  # already downloaded
 
         opus_tmp, pcm_tmp = get_temp_paths(url)
+        download = vc.loop.run_in_executor(
+            utils.FUTURES_EXECUTOR,
+            download_and_convert,
+            logger,
+            url,
+            opus_tmp,
+            pcm_tmp,
+            cache_path,
+            mixer.SAMPLE_RATE,
+            mixer.CHANNELS,
+        )
+        downloads.append((url, download))
+
+    # Run the downloads side by side in the executor, rather than one at a time
+    results = await asyncio.gather(
+        *(download for _, download in downloads), return_exceptions=True
+    )
+
+    queue_changed = False
+    for (url, _), result in zip(downloads, results, strict=True):
+        if not isinstance(result, Exception):
+            continue
+        logger.error("Failed to pre-download %s", url, exc_info=result)
         try:
-            await vc.loop.run_in_executor(
-                utils.FUTURES_EXECUTOR,
-                download_and_convert,
-                logger,
-                url,
-                opus_tmp,
-                pcm_tmp,
-                cache_path,
-                mixer.SAMPLE_RATE,
-                mixer.CHANNELS,
-            )
-        except Exception:
-            logger.exception("Failed to pre-download %s", url)
-            try:
-                queue.remove(url)
-                logger.warning("Removed %s from queue due to pre-download failure", url)
-                # Try fetching again, since the queue changed
-                await _maybe_preload_next_tracks(vc, queue, foresight)
-            except ValueError:
-                pass  # failed to remove is the only error this can catch, I think?
+            queue.remove(url)
+        except ValueError:
+            pass  # failed to remove is the only error this can catch, I think?
+        else:
+            logger.warning("Removed %s from queue due to pre-download failure", url)
+            queue_changed = True
+
+    if queue_changed:
+        # Try fetching again, since the queue changed
+        await _maybe_preload_next_tracks(vc, queue, foresight)
+
+
+def _text_channel(
+    vc: discord_utils.DISCORD_VOICE_CLIENT, text_channel: int | None
+) -> TextChannel | VoiceChannel | StageChannel | None:
+    """Get the channel to post playback messages in, if it can take messages."""
+    if text_channel is None:
+        return None
+    channel = vc.guild.get_channel(text_channel)
+    if channel is None or isinstance(channel, (ForumChannel, CategoryChannel)):
+        return None
+    return channel
 
 
 def create_before_after_functions(
@@ -108,77 +147,91 @@ def create_before_after_functions(
 
     def _before_play() -> None:
         logger.info("Starting playback for %s", url)
-        if text_channel is not None:
-            channel = vc.guild.get_channel(text_channel)
-            logger.info(
-                "Sending a playback started message to channel '%s' (instance of %s)",
-                channel,
-                type(channel),
-            )
-            if channel is not None and not isinstance(
-                channel, (ForumChannel, CategoryChannel)
-            ):
-                # Schedule an async task to fetch metadata and send the message
-                async def _send_now_playing() -> None:
-                    try:
-                        track = await get_youtube_track_metadata(url)
-                        content = (
-                            f"▶️    Now playing **[{track['title']}]({track['url']})**"
-                        )
-                        await channel.send(content=content)
-                    except Exception:
-                        logger.exception(
-                            "Failed to send 'now playing' message for %s", url
-                        )
-                        content = "Now playing next track"
-                        await channel.send(content=content)
-
-                vc.loop.create_task(_send_now_playing())
+        channel = _text_channel(vc, text_channel)
+        if channel is None:
+            return
+        logger.info(
+            "Sending a playback started message to channel '%s' (instance of %s)",
+            channel,
+            type(channel),
+        )
+
+        # Schedule an async task to fetch metadata and send the message
+        async def _send_now_playing() -> None:
+            try:
+                track = await get_youtube_track_metadata(url)
+                content = f"▶️    Now playing **[{track['title']}]({track['url']})**"
+                await channel.send(content=content)
+            except Exception:
+                logger.exception("Failed to send 'now playing' message for %s", url)
+                content = "Now playing next track"
+                await channel.send(content=content)
+
+        vc.loop.create_task(_send_now_playing())
 
     def _after_play() -> None:
+        gid = vc.guild.id
+        queue = youtube_queue.get(gid)
+        if not queue:
+            # The queue was stopped or cleared while this track was playing
+            logger.info("Finished playing %s; no queue for guild_id=%s", url, gid)
+            return
         # Remove the URL from the queue after playback
-        youtube_queue[vc.guild.id].pop(0)
+        queue.popleft()
 
         # If the queue is now empty, remove the guild entry
-        if not youtube_queue[vc.guild.id]:
-            youtube_queue.pop(vc.guild.id, None)
-            logger.info("Queue empty for guild_id=%s, removed queue", vc.guild.id)
-            if text_channel is not None:
-                channel = vc.guild.get_channel(text_channel)
-                if channel is not None and not isinstance(
-                    channel, (ForumChannel, CategoryChannel)
-                ):
-                    job = channel.send(content="😮‍💨    Finished playing queue!")
-                    vc.loop.create_task(job)
+        if not queue:
+            youtube_queue.pop(gid, None)
+            logger.info("Queue empty for guild_id=%s, removed queue", gid)
+            channel = _text_channel(vc, text_channel)
+            if channel is not None:
+                job = channel.send(content="😮‍💨    Finished playing queue!")
+                vc.loop.create_task(job)
 
         # Schedule the next track when this one finishes
-        logger.info("Finished playing %s for guild_id=%s", url, vc.guild.id)
+        logger.info("Finished playing %s for guild_id=%s", url, gid)
         vc.loop.create_task(_play_next(vc, text_channel=text_channel))
 
     return _before_play, _after_play
 
 
+async def _warm_metadata(url: str) -> None:
+    """Fetch the metadata for ``url`` into the cache.
+
+    Only the "now playing" message uses it, and that has its own fallback, so a
+    failure here is logged rather than stopping playback.
+    """
+    try:
+        await get_youtube_track_metadata(url)
+    except Exception:
+        logger.warning("Failed to fetch metadata for %s", url, exc_info=True)
+
+
 async def _play_next(
     vc: discord_utils.DISCORD_VOICE_CLIENT, text_channel: int | None = None
 ) -> None:
     """Internal: play the next URL in the queue for vc, if any."""
-    queue = youtube_queue.get(vc.guild.id)
-    logger.info("Queue length for guild_id=%s: %d", vc.guild.id, len(queue or []))
+    gid = vc.guild.id
+    queue = youtube_queue.get(gid)
+    logger.info("Queue length for guild_id=%s: %d", gid, len(queue or []))
 
     if not queue:
-        logger.info("No more tracks in queue for guild_id=%s", vc.guild.id)
-        youtube_queue.pop(vc.guild.id, None)
+        logger.info("No more tracks in queue for guild_id=%s", gid)
+        youtube_queue.pop(gid, None)
         return
 
     url = queue[0]
-    logger.info("Starting playback of %s for guild_id=%s", url, vc.guild.id)
-
-    await get_youtube_track_metadata(url)
+    logger.info("Starting playback of %s for guild_id=%s", url, gid)
 
     _before_play, _after_play = create_before_after_functions(url, vc, text_channel)
 
     try:
         mixer = discord_utils.get_mixer_from_voice_client(vc)
+        # Warm the metadata cache in the background, so a slow extract_info never
+        # holds up playback
+        warmup = vc.loop.create_task(_warm_metadata(url))
+        _metadata_warmups.add(warmup)
+        warmup.add_done_callback(_metadata_warmups.discard)
         cache_path = await fetch_audio_pcm(
             url,
             sample_rate=mixer.SAMPLE_RATE,
@@ -194,12 +247,20 @@ async def _play_next(
         # So, we need to call the play method again to get it going again.
         if not vc.is_playing():
             vc.play(mixer)
-
-        await _maybe_preload_next_tracks(vc, queue)
+    except asyncio.CancelledError:
+        logger.info("Playback of %s cancelled for guild_id=%s", url, gid)
+        # Nothing is going to play the rest of the queue now
+        youtube_queue.pop(gid, None)
+        raise
     except Exception:
         logger.exception("Error playing YouTube URL %s", url)
         # Clear the queue to avoid infinite retries
-        youtube_queue.pop(vc.guild.id, None)
+        youtube_queue.pop(gid, None)
+        return
+
+    # The track is in the mixer now, and its after_play callback moves the queue
+    # on, so being cancelled from here on must leave the queue alone
+    await _maybe_preload_next_tracks(vc, queue)
 
 
 def get_current_track(vc: discord_utils.DISCORD_VOICE_CLIENT) -> str | None:
@@ -223,9 +284,11 @@ async def skip(vc: discord_utils.DISCORD_VOICE_CLIENT) -> None:
 
 async def clear_queue(vc: discord_utils.DISCORD_VOICE_CLIENT) -> None:
     """Clear all queued tracks for the voice client. Excludes current playback."""
-    if vc.guild.id in youtube_queue:
+    queue = youtube_queue.get(vc.guild.id)
+    if queue is not None:
         # Remove all but the currently playing track
-        youtube_queue[vc.guild.id] = youtube_queue[vc.guild.id][:1]
+        while len(queue) > 1:
+            queue.pop()
         logger.info("Cleared YouTube queue for guild_id=%s", vc.guild.id)
 
 
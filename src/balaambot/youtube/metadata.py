@@ -12,6 +12,7 @@ from balaambot.youtube.utils import (
     check_is_playlist,
     extract_metadata,
     is_valid_youtube_url,
+    metadata_youtube_dl,
 )
 
 logger = logging.getLogger(__name__)
@@ -32,17 +33,11 @@ async def get_youtube_track_metadata(url: str) -> VideoMetadata:
             "No metadata in cache for URL. Fetching track metadata for URL: '%s'", url
         )
 
-    ydl_opts = {
-        "quiet": True,
-        "skip_download": True,
-        "extract_flat": True,
-    }
-
-    def _extract_info(opts: dict[str, Any], target_url: str) -> dict[str, Any] | None:
-        with YoutubeDL(opts) as ydl:
-            return ydl.extract_info(target_url, download=False)  # type: ignore[no-typing]
+    def _extract_info(target_url: str) -> dict[str, Any] | None:
+        ydl = metadata_youtube_dl(YoutubeDL)
+        return ydl.extract_info(target_url, download=False)  # type: ignore[no-typing]
 
-    info = await asyncio.to_thread(_extract_info, ydl_opts, url)
+    info = await asyncio.to_thread(_extract_info, url)
 
     if not info:
         msg = "Failed to get youtube metadata"
@@ -113,6 +108,24 @@ async def get_playlist_video_urls(playlist_url: str) -> list[str]:
     return video_urls
 
 
+async def get_playlist_metadata(
+    playlist_url: str, concurrency: int = 8
+) -> list[VideoMetadata]:
+    """Return the metadata for every video in the given playlist.
+
+    Lookups are dispatched concurrently, with at most ``concurrency`` in flight at
+    once so that a large playlist doesn't tie up every yt-dlp worker thread.
+    """
+    video_urls = await get_playlist_video_urls(playlist_url)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _fetch_one(url: str) -> VideoMetadata:
+        async with semaphore:
+            return await get_youtube_track_metadata(url)
+
+    return list(await asyncio.gather(*(_fetch_one(url) for url in video_urls)))
+
+
 async def search_youtube(search: str, n: int = 5) -> list[tuple[str, str, float]]:
     """Return the top ``n`` search results for the given query."""
     ydl_opts: dict[str, Any] = {
@@ -1,10 +1,19 @@
 import atexit
+import contextlib
+import errno
+import functools
 import logging
+import mmap
+import os
 import re
 import shutil
+import tempfile
+import threading
 import urllib.parse
+from collections.abc import Callable
+from contextlib import AbstractContextManager
 from pathlib import Path
-from typing import Any, TypedDict, cast
+from typing import Any, Protocol, TypedDict, TypeVar, cast
 
 import balaambot.config
 from balaambot.utils import get_cache, sec_to_string, set_cache
@@ -14,6 +23,8 @@ logger = logging.getLogger(__name__)
 DEFAULT_SAMPLE_RATE = 48000  # Default sample rate for PCM audio
 DEFAULT_CHANNELS = 2  # Default number of audio channels (stereo)
 
+T = TypeVar("T")
+
 
 logger.info(
     "Using a sample rate of %dHz with %d channels",
@@ -51,6 +62,60 @@ class VideoMetadata(TypedDict):
     runtime_str: str  # formatted as H:MM:SS or M:SS
 
 
+class CacheBackend(Protocol):
+    """Storage operations used when populating the audio cache."""
+
+    def exists(self, path: Path) -> bool:
+        """Return True if ``path`` holds data."""
+        ...
+
+    def move(self, src: Path, dst: Path) -> None:
+        """Move ``src`` to ``dst``, replacing ``dst`` if it exists."""
+        ...
+
+    def remove(self, path: Path) -> None:
+        """Delete ``path``. Missing paths are ignored."""
+        ...
+
+
+class FilesystemBackend:
+    """Cache backend that operates directly on the local filesystem."""
+
+    def exists(self, path: Path) -> bool:
+        """Return True if ``path`` exists on disk."""
+        return path.exists()
+
+    def move(self, src: Path, dst: Path) -> None:
+        """Atomically rename ``src`` over ``dst``.
+
+        A rename can't cross filesystems (e.g. when the cache directory is its
+        own mount), so then ``src`` is copied next to ``dst`` and renamed from
+        there instead. shutil.copyfile does the copy in the kernel with sendfile
+        on Linux, so the data never passes through Python.
+        """
+        try:
+            src.replace(dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            fd, tmp_name = tempfile.mkstemp(
+                dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp"
+            )
+            os.close(fd)
+            tmp = Path(tmp_name)
+            try:
+                shutil.copyfile(src, tmp)
+                tmp.replace(dst)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+            src.unlink()
+
+    def remove(self, path: Path) -> None:
+        """Unlink ``path`` if it exists."""
+        path.unlink(missing_ok=True)
+
+
 # Regex to extract YouTube video ID
 _YT_ID_RE = re.compile(
     r"""
@@ -165,8 +230,9 @@ def is_valid_youtube_url(url: str) -> bool:
     return _VALID_YT_URL_RE.match(url) is not None
 
 
+@functools.lru_cache(maxsize=4096)
 def get_video_id(url: str) -> str:
-    """Extract the video ID from a YouTube URL."""
+    """Extract the video ID from a YouTube URL. Results are memoised per URL."""
     match = _YT_ID_RE.match(url)
     if match is not None:
         return match.group("id")
@@ -179,17 +245,27 @@ def get_cache_path(url: str, sample_rate: int, channels: int) -> Path:
     """Compute the cache file path for a URL and audio parameters."""
     vid = get_video_id(url)
     base = vid or url.replace("/", "_")
-    filename = f"{base}_{sample_rate}Hz_{channels}ch.pcm"
-    return audio_cache_dir / filename
+    return audio_cache_dir / _cache_filename(base, sample_rate, channels)
+
+
+@functools.lru_cache(maxsize=4096)
+def _cache_filename(base: str, sample_rate: int, channels: int) -> str:
+    # Only the name is memoised, so patching audio_cache_dir still takes effect
+    return f"{base}_{sample_rate}Hz_{channels}ch.pcm"
 
 
 def get_temp_paths(url: str) -> tuple[Path, Path]:
     """Construct the tempfile paths for youtube downloading."""
     vid = get_video_id(url)
     base = vid or url.replace("/", "_")
-    opus_tmp = audio_tmp_dir / f"{base}.opus.part"
-    pcm_tmp = audio_tmp_dir / f"{base}.pcm.part"
-    return opus_tmp, pcm_tmp
+    opus_name, pcm_name = _temp_filenames(base)
+    return audio_tmp_dir / opus_name, audio_tmp_dir / pcm_name
+
+
+@functools.lru_cache(maxsize=4096)
+def _temp_filenames(base: str) -> tuple[str, str]:
+    # Only the names are memoised, so patching audio_tmp_dir still takes effect
+    return f"{base}.opus.part", f"{base}.pcm.part"
 
 
 def get_metadata_path(url: str) -> Path:
@@ -207,14 +283,25 @@ def is_valid_youtube_playlist(url: str) -> bool:
 
 def get_audio_pcm(
     url: str, sample_rate: int = DEFAULT_SAMPLE_RATE, channels: int = DEFAULT_CHANNELS
-) -> bytearray | None:
-    """Retrieve PCM audio data for a previously fetched URL."""
+) -> mmap.mmap | None:
+    """Retrieve PCM audio data for a previously fetched URL.
+
+    The cached file is memory-mapped read-only rather than copied onto the heap.
+    The returned map supports the buffer protocol and slicing, and should be closed
+    by the caller once it's finished with.
+    """
     path = get_cache_path(url, sample_rate, channels)
-    if not path.exists():
+    if not path.exists() or path.stat().st_size == 0:
         logger.error("No cached audio for URL: %s", url)
         return None
-    data = path.read_bytes()
-    return bytearray(data)
+
+    with path.open("rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Let the kernel read ahead, since audio is consumed front to back
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        data.madvise(mmap.MADV_SEQUENTIAL)
+    return data
 
 
 def remove_audio_pcm(
@@ -243,3 +330,40 @@ def check_is_playlist(url: str) -> bool:
 
     # 'list' will be a key if there's a playlist ID in the URL
     return bool(params.get("list", False))
+
+
+# Options for single-video metadata lookups. Lookups with these options are the
+# only ones that reuse a yt-dlp client, see metadata_youtube_dl.
+METADATA_YDL_OPTS: dict[str, Any] = {
+    "quiet": True,
+    "skip_download": True,
+    "extract_flat": True,
+}
+
+# Per-thread metadata client, see metadata_youtube_dl
+_metadata_clients = threading.local()
+
+
+def metadata_youtube_dl(
+    factory: Callable[[dict[str, Any]], AbstractContextManager[T]],
+) -> T:
+    """Get this thread's yt-dlp client for metadata lookups.
+
+    Building a YoutubeDL takes the best part of 100 ms, which every metadata
+    lookup used to pay. Clients aren't safe to share between threads, so each
+    thread keeps exactly one, built by ``factory`` from METADATA_YDL_OPTS. Asking
+    with a different factory closes the previous client first. The caller must
+    not close the client.
+    """
+    if getattr(_metadata_clients, "factory", None) is not factory:
+        previous: contextlib.ExitStack | None = getattr(
+            _metadata_clients, "stack", None
+        )
+        _metadata_clients.__dict__.clear()
+        if previous is not None:
+            previous.close()
+        stack = contextlib.ExitStack()
+        _metadata_clients.client = stack.enter_context(factory(dict(METADATA_YDL_OPTS)))
+        _metadata_clients.stack = stack
+        _metadata_clients.factory = factory
+    return _metadata_clients.client
@@ -1,9 +1,12 @@
 # type: ignore
 import array
 import asyncio
-import shutil
+import io
+import logging
+import os
 from uuid import uuid4
 import subprocess
+import threading
 from pathlib import Path
 
 import pytest
@@ -25,6 +28,17 @@ class MockVoiceChat:
         self.loop = Loop()
 
 
+class InlineThread:
+    """Runs the target as soon as it's started, so decoding finishes in-line."""
+
+    def __init__(self, target, args=(), **kwargs):
+        self._target = target
+        self._args = args
+
+    def start(self):
+        self._target(*self._args)
+
+
 def test_is_opus_returns_false():
     vc = MockVoiceChat()
     src = MultiAudioSource(vc)
@@ -56,6 +70,23 @@ def test_mix_samples_combines_and_clears_tracks():
     assert src._sfx == []
 
 
+def test_mix_samples_scales_and_clamps_normalised_tracks():
+    vc = MockVoiceChat()
+    src = MultiAudioSource(vc, normalise_audio=True)
+    src.CHUNK_SIZE = 8
+
+    loud = {"name": "loud", "id": uuid4(), "samples": array.array("h", [20000, -20000, 1, 0]), "pos": 0, "after_play": None, "before_play": None}
+    plain = {"name": "plain", "id": uuid4(), "samples": array.array("h", [5, 5]), "pos": 0, "after_play": None, "before_play": None}
+    src._track_norm_factors[loud["id"]] = 3.0
+    src._tracks = [loud, plain]
+
+    total = src._mix_samples()
+
+    # Each scaled sample is clamped to int16 before mixing; the short track is
+    # only added where it has samples
+    assert list(total) == [32767 + 5, -32768 + 5, 3, 0]
+
+
 def test_read_clips_and_respects_stopped(monkeypatch):
     vc = MockVoiceChat()
     src = MultiAudioSource(vc)
@@ -82,6 +113,64 @@ def test_read_clips_and_respects_stopped(monkeypatch):
     assert silence == b""
 
 
+def test_read_idle_returns_shared_silence():
+    src = MultiAudioSource(MockVoiceChat())
+    src._stopped = False
+
+    assert src._mix_samples() is None
+    first = src.read()
+    assert first == bytes(src.CHUNK_SIZE)
+    assert src.read() is first
+
+
+def test_read_single_track_copies_samples_through(tmp_path):
+    src = MultiAudioSource(MockVoiceChat())
+    src.CHUNK_SIZE = 8
+    src._stopped = False
+    pcm = array.array("h", [32767, -32768, 7, -7, 1, 2]).tobytes()
+    path = tmp_path / "track.pcm"
+    path.write_bytes(pcm)
+    src.play_pcm(path)
+
+    assert src.read() == pcm[:8]
+    # The short final chunk is padded with silence
+    assert src.read() == pcm[8:] + bytes(4)
+    assert src.num_tracks == 0
+
+
+def test_single_track_is_still_clipped_to_custom_limits(tmp_path):
+    src = MultiAudioSource(MockVoiceChat())
+    src.CHUNK_SIZE = 4
+    src.MIN_VOLUME = -10
+    src.MAX_VOLUME = 10
+    src._stopped = False
+    path = tmp_path / "track.pcm"
+    path.write_bytes(array.array("h", [100, -100]).tobytes())
+    src.play_pcm(path)
+
+    out = array.array("h")
+    out.frombytes(src.read())
+    assert list(out) == [10, -10]
+
+
+def test_read_clips_overflow_at_default_limits():
+    vc = MockVoiceChat()
+    src = MultiAudioSource(vc)
+    src._stopped = False
+
+    # In range: packed straight through
+    src._mix_samples = lambda: array.array("i", [1, -2, 3, 32767])
+    out = array.array("h")
+    out.frombytes(src.read())
+    assert list(out) == [1, -2, 3, 32767]
+
+    # Overflowing sums are clipped to int16
+    src._mix_samples = lambda: array.array("i", [40000, -40000, 3, 0])
+    out = array.array("h")
+    out.frombytes(src.read())
+    assert list(out) == [32767, -32768, 3, 0]
+
+
 def test_play_file_success(monkeypatch, tmp_path):
     vc = MockVoiceChat()
     src = MultiAudioSource(vc)
@@ -91,18 +180,20 @@ def test_play_file_success(monkeypatch, tmp_path):
     dummy = tmp_path / "dummy.wav"
     dummy.write_bytes(b"")
 
-    # Stub ffmpeg detection
-    monkeypatch.setattr(shutil, "which", lambda name: "ffmpeg")
+    # Pretend ffmpeg was found at import
+    monkeypatch.setattr(mas, "FFMPEG_BIN", "ffmpeg")
 
     # Stub subprocess.Popen
     class DummyPopen:
         def __init__(self, args, stdout, stderr):
-            self.returncode = 0
+            self.stdout = io.BytesIO(b"\x01\x00\x02\x00")
+            self.stderr = io.BytesIO(b"")
 
-        def communicate(self):
-            return (b"\x01\x00\x02\x00", b"")
+        def wait(self):
+            return 0
 
     monkeypatch.setattr(subprocess, "Popen", DummyPopen)
+    monkeypatch.setattr(mas.threading, "Thread", InlineThread)
 
     # Patch create_task on vc.loop to record scheduling of functions
     scheduled = []
@@ -141,12 +232,185 @@ def test_play_file_success(monkeypatch, tmp_path):
     assert len(scheduled) == 2
 
 
+def test_mix_samples_waits_for_decoding_track():
+    vc = MockVoiceChat()
+    src = MultiAudioSource(vc)
+    src.CHUNK_SIZE = 8  # 4 samples
+
+    samples = array.array("h", [1, 2])
+    track = {"name": "sfx", "id": uuid4(), "samples": samples, "pos": 0, "after_play": None, "before_play": None, "decoding": True}
+    src._sfx = [track]
+
+    # Only part of a chunk is decoded so far: play it and wait for the rest
+    assert list(src._mix_samples()) == [1, 2, 0, 0]
+    assert track["pos"] == 2
+    assert src._sfx == [track]
+
+    # Nothing new decoded: the track is kept, but contributes nothing
+    assert list(src._mix_samples()) == [0, 0, 0, 0]
+    assert src._sfx == [track]
+
+    # Decoding finishes, so the track plays out and is dropped
+    samples.extend([3, 4])
+    track["decoding"] = False
+    assert list(src._mix_samples()) == [3, 4, 0, 0]
+    assert src._sfx == []
+
+
+def test_play_file_reuses_decoded_pcm(monkeypatch, tmp_path):
+    vc = MockVoiceChat()
+    src = MultiAudioSource(vc)
+    dummy = tmp_path / "dummy.wav"
+    dummy.write_bytes(b"")
+    monkeypatch.setattr(mas, "FFMPEG_BIN", "ffmpeg")
+
+    spawned = []
+
+    class DummyPopen:
+        def __init__(self, args, stdout, stderr):
+            spawned.append(args)
+            self.stdout = io.BytesIO(b"\x01\x00\x02\x00")
+            self.stderr = io.BytesIO(b"")
+
+        def wait(self):
+            return 0
+
+    monkeypatch.setattr(subprocess, "Popen", DummyPopen)
+    monkeypatch.setattr(mas.threading, "Thread", InlineThread)
+
+    src.play_file(str(dummy))
+    src.play_file(str(dummy))
+
+    # ffmpeg only ran once; the replay is ready to go without decoding
+    assert len(spawned) == 1
+    first, second = src._sfx
+    assert list(second["samples"]) == list(first["samples"]) == [1, 2]
+    assert second["decoding"] is False
+
+    # Changing the file invalidates the cached audio
+    dummy.write_bytes(b"new")
+    os.utime(dummy, ns=(0, 0))
+    src.play_file(str(dummy))
+    assert len(spawned) == 2
+
+
+def test_decoded_sfx_cache_keeps_to_byte_budget(monkeypatch):
+    monkeypatch.setattr(mas, "DECODED_SFX_CACHE_BYTES", 10)
+
+    mas._remember_decoded_sfx(("a", 0), b"a" * 4)
+    mas._remember_decoded_sfx(("b", 0), b"b" * 4)
+    assert mas._recall_decoded_sfx(("a", 0)) == b"a" * 4
+    # Over budget: the least recently played goes first
+    mas._remember_decoded_sfx(("c", 0), b"c" * 4)
+    assert list(mas._decoded_sfx) == [("a", 0), ("c", 0)]
+
+    # Too big to ever fit, so it isn't cached and evicts nothing
+    mas._remember_decoded_sfx(("d", 0), b"d" * 11)
+    assert list(mas._decoded_sfx) == [("a", 0), ("c", 0)]
+
+
+def test_play_file_ffmpeg_failure_ends_track(monkeypatch, tmp_path, caplog):
+    vc = MockVoiceChat()
+    src = MultiAudioSource(vc)
+    dummy = tmp_path / "dummy.wav"
+    dummy.write_bytes(b"")
+    monkeypatch.setattr(mas, "FFMPEG_BIN", "ffmpeg")
+
+    class FailingPopen:
+        def __init__(self, args, stdout, stderr):
+            # An odd trailing byte is held back, never half-decoded
+            self.stdout = io.BytesIO(b"\x07\x00\x08")
+            self.stderr = io.BytesIO(b"bad input")
+
+        def wait(self):
+            return 1
+
+    monkeypatch.setattr(subprocess, "Popen", FailingPopen)
+    monkeypatch.setattr(mas.threading, "Thread", InlineThread)
+
+    with caplog.at_level(logging.ERROR, logger=mas.logger.name):
+        src.play_file(str(dummy))
+
+    track = src._sfx[0]
+    assert list(track["samples"]) == [7]
+    assert track["decoding"] is False
+    assert "bad input" in caplog.text
+    # A failed decode isn't kept for next time
+    assert mas._decoded_sfx == {}
+
+
+def test_play_file_reassembles_samples_split_across_reads(monkeypatch, tmp_path):
+    src = MultiAudioSource(MockVoiceChat())
+    dummy = tmp_path / "dummy.wav"
+    dummy.write_bytes(b"")
+    monkeypatch.setattr(mas, "FFMPEG_BIN", "ffmpeg")
+    pcm = array.array("h", [1, -2, 300, -400]).tobytes()
+
+    class TricklingPipe(io.BytesIO):
+        # A pipe can hand back any number of bytes, including half a sample
+        def readinto(self, b):
+            return super().readinto(memoryview(b)[:3])
+
+    class DummyPopen:
+        def __init__(self, args, stdout, stderr):
+            self.stdout = TricklingPipe(pcm)
+            self.stderr = io.BytesIO(b"")
+
+        def wait(self):
+            return 0
+
+    monkeypatch.setattr(subprocess, "Popen", DummyPopen)
+    monkeypatch.setattr(mas.threading, "Thread", InlineThread)
+
+    src.play_file(str(dummy))
+
+    assert list(src._sfx[0]["samples"]) == [1, -2, 300, -400]
+
+
+@pytest.mark.parametrize("drop", ["clear_sfx", "clear_queue", "cleanup"])
+def test_play_file_kills_ffmpeg_when_track_dropped(monkeypatch, tmp_path, drop):
+    src = MultiAudioSource(MockVoiceChat())
+    dummy = tmp_path / "dummy.wav"
+    dummy.write_bytes(b"")
+    monkeypatch.setattr(mas, "FFMPEG_BIN", "ffmpeg")
+    procs = []
+
+    class DroppingPipe(io.BytesIO):
+        # The track is removed while ffmpeg is still producing output
+        def readinto(self, b):
+            getattr(src, drop)()
+            return super().readinto(memoryview(b)[:2])
+
+    class DummyPopen:
+        def __init__(self, args, stdout, stderr):
+            self.stdout = DroppingPipe(b"\x01\x00\x02\x00")
+            self.stderr = io.BytesIO(b"")
+            self.killed = False
+            procs.append(self)
+
+        def kill(self):
+            self.killed = True
+
+        def wait(self):
+            return -9 if self.killed else 0
+
+    monkeypatch.setattr(subprocess, "Popen", DummyPopen)
+    monkeypatch.setattr(mas.threading, "Thread", InlineThread)
+
+    src.play_file(str(dummy))
+
+    assert procs[0].killed
+    assert src._sfx == []
+    # Half-decoded audio isn't kept for next time
+    assert mas._decoded_sfx == {}
+
+
 def test_play_file_ffmpeg_not_found(monkeypatch, tmp_path):
     vc = MockVoiceChat()
     src = MultiAudioSource(vc)
     dummy = tmp_path / "dummy.wav"
     dummy.write_bytes(b"")
-    monkeypatch.setattr(shutil, "which", lambda name: None)
+    monkeypatch.setattr(mas, "FFMPEG_BIN", None)
     with pytest.raises(RuntimeError) as exc:
         src.play_file(str(dummy))
     assert "ffmpeg not found" in str(exc.value)
@@ -159,7 +423,6 @@ def test_play_file_file_not_found():
         src.play_file("nonexistent.wav")
 
 
-@pytest.mark.asyncio
 async def test_ensure_mixer_creates_and_reuses():
     # Clear existing mixers
     _mixers.clear()
@@ -191,15 +454,53 @@ async def test_ensure_mixer_creates_and_reuses():
     assert vc2.played == []
 
 
+def test_ensure_mixer_concurrent_callers_share_one_mixer():
+    calls = []
+    in_play = threading.Event()
+    release = threading.Event()
+
+    class DummyGuild:
+        def __init__(self, id):
+            self.id = id
+
+    class SlowVC:
+        def __init__(self):
+            self.guild = DummyGuild(7)
+
+        def play(self, source, **kwargs):
+            calls.append(source)
+            in_play.set()
+            # Hold the first caller mid-create while the others pile in
+            release.wait(timeout=1)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(ensure_mixer(SlowVC())))
+        for _ in range(8)
+    ]
+    threads[0].start()
+    in_play.wait(timeout=1)
+    for t in threads[1:]:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join(timeout=1)
+
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(m is calls[0] for m in results)
+
+
 @pytest.fixture(autouse=True)
 def clear_mixers_and_tracks():
     # Clear global mixer registry and ensure fresh instances
     _mixers.clear()
+    mas._decoded_sfx.clear()
     yield
     _mixers.clear()
+    mas._decoded_sfx.clear()
 
 
-@pytest.mark.asyncio
 async def test_ensure_mixer_multiple_guilds(monkeypatch):
     class DummyGuild:
         def __init__(self, id):
@@ -281,8 +582,8 @@ def test_mix_samples_with_callback_and_padding(monkeypatch):
     )
 
     total = src._mix_samples()
-    # Should have [5, 0] as int32 array
-    assert isinstance(total, array.array) and total.typecode == "i"
+    # A lone track comes back as int16, padded to [5, 0]
+    assert isinstance(total, array.array) and total.typecode == "h"
     assert total.tolist() == [5, 0]
 
     # callbacks should have been called once each
@@ -1,11 +1,16 @@
+import asyncio
+import dataclasses
 import json
+import logging
+import os
+import stat
 import pytest
-import types
 from balaambot.cats.cat_handler import CatHandler
 from balaambot.cats import cat_handler
 
 GUILD_ID = 12345
 
+
 @pytest.fixture
 def patch_save_file(monkeypatch, tmp_path):
     # Patch SAVE_FILE to a temp file
@@ -13,22 +18,28 @@ def patch_save_file(monkeypatch, tmp_path):
     monkeypatch.setattr(cat_handler, "SAVE_FILE", save_file)
     return save_file
 
-@pytest.fixture
-def patch_logger(monkeypatch):
-    dummy_logger = types.SimpleNamespace(
-        info=lambda *a, **k: None,
-        exception=lambda *a, **k: None,
-    )
-    monkeypatch.setattr(cat_handler, "logger", dummy_logger)
-    return dummy_logger
 
-def test_init_no_file(patch_save_file, patch_logger):
+@pytest.fixture(scope="module", autouse=True)
+def silence_cat_logger():
+    # Drop the handler's log records before they're even created
+    old_level = cat_handler.logger.level
+    cat_handler.logger.setLevel(logging.CRITICAL + 1)
+    yield
+    cat_handler.logger.setLevel(old_level)
+
+
+def test_init_no_file(patch_save_file):
     handler = CatHandler()
     assert handler.get_num_cats(GUILD_ID) == 0
 
-def test_init_with_valid_file(patch_save_file, patch_logger):
+
+def test_init_with_valid_file(patch_save_file):
     owner_id = 123456
-    cats_data = {"guild_cats": {str(GUILD_ID): {"mittens": {"name": "Mittens", "owner": owner_id}}}}
+    cats_data = {
+        "guild_cats": {
+            str(GUILD_ID): {"mittens": {"name": "Mittens", "owner": owner_id}}
+        }
+    }
     patch_save_file.write_text(json.dumps(cats_data))
     handler = CatHandler()
     assert "mittens" in handler.db.guild_cats.get(GUILD_ID, {})
@@ -37,18 +48,22 @@ def test_init_with_valid_file(patch_save_file, patch_logger):
     assert cat_obj.name == "Mittens"
     assert cat_obj.owner == owner_id
 
-def test_init_with_invalid_json(patch_save_file, patch_logger, monkeypatch):
-    logged = {}
-    def fake_exception(msg, *a, **k): logged["called"] = True
-    monkeypatch.setattr(cat_handler, "logger", types.SimpleNamespace(
-        info=lambda *a, **k: None,
-        exception=fake_exception,
-    ))
-    patch_save_file.write_text("{not valid json")
+
+def test_init_with_invalid_schema(patch_save_file):
+    patch_save_file.write_text(json.dumps({"guild_cats": {"1": {"x": {"name": "X"}}}}))
     handler = CatHandler()
-    assert logged.get("called")
+    assert handler.db.guild_cats == {}
 
-def test_add_cat_creates_and_persists(patch_save_file, patch_logger):
+
+def test_init_with_invalid_json(patch_save_file, caplog):
+    patch_save_file.write_text("{not valid json")
+    with caplog.at_level(logging.ERROR, logger=cat_handler.logger.name):
+        handler = CatHandler()
+    assert handler.db.guild_cats == {}
+    assert any(r.levelno == logging.ERROR for r in caplog.records)
+
+
+def test_add_cat_creates_and_persists(patch_save_file):
     handler = CatHandler()
     owner_id = 555
     handler.add_cat("Whiskers", GUILD_ID, owner_id)
@@ -66,7 +81,8 @@ def test_add_cat_creates_and_persists(patch_save_file, patch_logger):
     assert data["guild_cats"][str(GUILD_ID)]["whiskers"]["name"] == "Whiskers"
     assert data["guild_cats"][str(GUILD_ID)]["whiskers"]["owner"] == owner_id
 
-def test_add_cat_normalizes_id(patch_save_file, patch_logger):
+
+def test_add_cat_normalizes_id(patch_save_file):
     handler = CatHandler()
     owner_id = 123
     handler.add_cat("  Fluffy  ", GUILD_ID, owner_id)
@@ -79,7 +95,8 @@ def test_add_cat_normalizes_id(patch_save_file, patch_logger):
     cat_obj = handler.db.guild_cats[GUILD_ID]["fluffy"]
     assert cat_obj.owner == owner_id
 
-def test_get_cat_names(patch_save_file, patch_logger):
+
+def test_get_cat_names(patch_save_file):
     handler = CatHandler()
     owner1 = 1
     owner2 = 2
@@ -90,14 +107,16 @@ def test_get_cat_names(patch_save_file, patch_logger):
     assert f"- B (Owner: <@{owner2}>)" in names
     assert names.count("- ") == 2
 
-def test_get_num_cats(patch_save_file, patch_logger):
+
+def test_get_num_cats(patch_save_file):
     handler = CatHandler()
     assert handler.get_num_cats(GUILD_ID) == 0
     handler.add_cat("X", GUILD_ID, 1)
     handler.add_cat("Y", GUILD_ID, 2)
     assert handler.get_num_cats(GUILD_ID) == 2
 
-def test_save_creates_file_if_missing(patch_save_file, patch_logger):
+
+def test_save_creates_file_if_missing(patch_save_file):
     handler = CatHandler()
     handler.add_cat("Zed", GUILD_ID, 42)
     assert patch_save_file.exists()
@@ -109,12 +128,65 @@ def test_save_creates_file_if_missing(patch_save_file, patch_logger):
     assert data["guild_cats"][str(GUILD_ID)]["zed"]["name"] == "Zed"
     assert data["guild_cats"][str(GUILD_ID)]["zed"]["owner"] == 42
 
-def test_get_cat_id_normalization(patch_save_file, patch_logger):
+
+def test_cat_is_immutable():
+    cat = cat_handler.Cat(name="Solid", owner=1)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cat.name = "Liquid"  # type: ignore[misc]
+    assert not hasattr(cat, "__dict__")
+
+
+def test_save_replaces_file_atomically(patch_save_file):
+    patch_save_file.write_text("old contents")
+    handler = CatHandler()
+    handler.add_cat("Atom", GUILD_ID, 3)
+    data = json.loads(patch_save_file.read_text())
+    assert data["guild_cats"][str(GUILD_ID)]["atom"]["name"] == "Atom"
+    # No temporary files left lying around
+    assert list(patch_save_file.parent.iterdir()) == [patch_save_file]
+
+
+def test_save_keeps_existing_file_mode(patch_save_file):
+    patch_save_file.write_text("{}")
+    patch_save_file.chmod(0o640)
+    handler = CatHandler()
+    handler.add_cat("Perm", GUILD_ID, 5)
+    assert stat.S_IMODE(patch_save_file.stat().st_mode) == 0o640
+
+
+def test_save_new_file_follows_umask(patch_save_file, monkeypatch):
+    old_umask = os.umask(0o027)
+    try:
+        with monkeypatch.context() as m:
+            # The umask is process-wide, so saving must never change it, even
+            # briefly, under other threads' feet
+            m.setattr(os, "umask", lambda mask: pytest.fail("umask changed"))
+            CatHandler().add_cat("Fresh", GUILD_ID, 6)
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(patch_save_file.stat().st_mode) == 0o640
+
+
+def test_save_failure_cleans_up_temp_file(patch_save_file, monkeypatch):
+    handler = CatHandler()
+
+    def fail_replace(self, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cat_handler.pathlib.Path, "replace", fail_replace)
+    with pytest.raises(OSError):
+        handler.add_cat("Doomed", GUILD_ID, 1)
+    assert list(patch_save_file.parent.iterdir()) == []
+
+
+def test_get_cat_id_normalization(patch_save_file):
     handler = CatHandler()
     assert handler._get_cat_id("  Foo  ") == "foo"
     assert handler._get_cat_id("BAR") == "bar"
+    assert handler._get_cat_id("  ÉCLAIR ") == "éclair"
 
-def test_cats_are_isolated_by_guild(patch_save_file, patch_logger):
+
+def test_cats_are_isolated_by_guild(patch_save_file):
     handler = CatHandler()
     guild1 = 111
     guild2 = 222
@@ -134,7 +206,8 @@ def test_cats_are_isolated_by_guild(patch_save_file, patch_logger):
     assert handler.get_num_cats(guild1) == 1
     assert handler.get_num_cats(guild2) == 1
 
-def test_guilds_are_persisted_separately(patch_save_file, patch_logger):
+
+def test_guilds_are_persisted_separately(patch_save_file):
     handler = CatHandler()
     guild1 = 333
     guild2 = 444
@@ -147,13 +220,15 @@ def test_guilds_are_persisted_separately(patch_save_file, patch_logger):
     assert handler2.get_cat("Tiger", guild2) is None
     assert handler2.get_cat("Shadow", guild1) is None
 
-def test_get_cat_returns_none_if_guild_missing(patch_save_file, patch_logger):
+
+def test_get_cat_returns_none_if_guild_missing(patch_save_file):
     handler = CatHandler()
     # Use a guild_id that does not exist
     cat = handler.get_cat("anycat", 99999)
     assert cat is None
 
-def test_remove_cat_success(patch_save_file, patch_logger):
+
+def test_remove_cat_success(patch_save_file):
     handler = CatHandler()
     owner_id = 123
     handler.add_cat("Whiskers", GUILD_ID, owner_id)
@@ -164,7 +239,24 @@ def test_remove_cat_success(patch_save_file, patch_logger):
     # Cat is gone
     assert handler.get_cat("Whiskers", GUILD_ID) is None
 
-def test_remove_cat_not_owner(patch_save_file, patch_logger):
+
+def test_remove_last_cat_drops_guild(patch_save_file):
+    handler = CatHandler()
+    handler.add_cat("Solo", GUILD_ID, 1)
+    handler.remove_cat("Solo", GUILD_ID, 1)
+    assert GUILD_ID not in handler.db.guild_cats
+    assert handler.get_num_cats(GUILD_ID) == 0
+
+
+def test_remove_cat_unknown_guild_does_not_create_entry(patch_save_file):
+    handler = CatHandler()
+    success, _ = handler.remove_cat("Nobody", 777, 1)
+    assert success is False
+    assert 777 not in handler.db.guild_cats
+    assert handler.get_cat_names(777) == ""
+
+
+def test_remove_cat_not_owner(patch_save_file):
     handler = CatHandler()
     owner_id = 123
     other_id = 456
@@ -176,9 +268,40 @@ def test_remove_cat_not_owner(patch_save_file, patch_logger):
     # Cat still exists
     assert handler.get_cat("Whiskers", GUILD_ID) == "Whiskers"
 
-def test_remove_cat_not_exist(patch_save_file, patch_logger):
+
+def test_remove_cat_not_exist(patch_save_file):
     handler = CatHandler()
     # Try to remove a cat that doesn't exist
     success, msg = handler.remove_cat("Ghost", GUILD_ID, 123)
     assert success is False
     assert "No cat named Ghost exists" in msg
+
+
+async def test_saves_are_coalesced_inside_event_loop(patch_save_file, monkeypatch):
+    monkeypatch.setattr(cat_handler, "SAVE_DELAY", 60)
+    handler = CatHandler()
+    saves = []
+    monkeypatch.setattr(handler, "_save_cat_db", lambda db: saves.append(db))
+
+    handler.add_cat("A", GUILD_ID, 1)
+    handler.add_cat("B", GUILD_ID, 2)
+    handler.remove_cat("A", GUILD_ID, 1)
+    # Nothing written yet, a single save is pending
+    assert saves == []
+
+    handler.flush()
+    assert saves == [handler.db]
+    # Flushing with nothing pending is a no-op
+    handler.flush()
+    assert len(saves) == 1
+
+
+async def test_pending_save_written_after_delay(patch_save_file, monkeypatch):
+    monkeypatch.setattr(cat_handler, "SAVE_DELAY", 0)
+    handler = CatHandler()
+    handler.add_cat("Later", GUILD_ID, 7)
+    assert not patch_save_file.exists()
+
+    await asyncio.sleep(0.01)
+    data = json.loads(patch_save_file.read_text())
+    assert data["guild_cats"][str(GUILD_ID)]["later"]["owner"] == 7
@@ -0,0 +1,22 @@
+import pytest
+
+from balaambot import discord_utils
+
+
+@pytest.fixture
+def patch_mixer(monkeypatch):
+    """Make ``discord_utils.get_mixer_from_voice_client`` return the given mixer.
+
+    Pass an exception instance instead to have the lookup raise it.
+    """
+
+    def _apply(mixer):
+        def _get_mixer(vc):
+            if isinstance(mixer, BaseException):
+                raise mixer
+            return mixer
+
+        monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", _get_mixer)
+        return mixer
+
+    return _apply
@@ -0,0 +1,168 @@
+"""Stand-ins for discord.py objects, shared across the test modules."""
+
+import asyncio
+import collections
+import functools
+
+
+def settled_future(result=None, exc=None):
+    """An already-finished future on the running loop.
+
+    Stands in for tasks and executor jobs: it can be cancelled (a no-op) and
+    awaited as often as needed, without scheduling anything on the loop.
+    """
+    fut = asyncio.get_running_loop().create_future()
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+    return fut
+
+
+class DummyGuild:
+    # get_channel is plugged in by the tests that need it
+    __slots__ = ("_members", "get_channel", "id", "voice_client")
+
+    def __init__(self, id=None, voice_client=None, members=None):
+        self.id = id
+        self.voice_client = voice_client
+        # members: dict mapping user_id -> DummyMember
+        self._members = members or {}
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+
+class DummyLoop:
+    """Forwards to the running loop. Tests override methods on this instead, so
+    their stubs never leak onto the real loop (which uses them on shutdown)."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+
+    def create_task(self, coro, *args, **kwargs):
+        return self._loop.create_task(coro, *args, **kwargs)
+
+    def run_in_executor(self, executor, func, *args):
+        return self._loop.run_in_executor(executor, func, *args)
+
+
+class DummyVC:
+    def __init__(self, guild_id, connected=True):
+        self.guild = DummyGuild(guild_id)
+        self._connected = connected
+        self.disconnect_called = False
+        self.playing = False
+
+    @functools.cached_property
+    def loop(self):
+        # Built on first use, since most tests never touch it.
+        # Override run_in_executor or create_task per‐test
+        return DummyLoop()
+
+    def is_connected(self):
+        return self._connected
+
+    async def disconnect(self, force=False):
+        self.disconnect_called = True
+        self._connected = False
+
+    async def connect(self):
+        self._connected = True
+        return self
+
+    def is_playing(self):
+        return self.playing
+
+    def play(self, *args, **kwargs):
+        self.playing = True
+
+
+class DummyVoiceClient:
+    __slots__ = ("_disconnected", "channel")
+
+    def __init__(self, channel=None):
+        self.channel = channel
+        self._disconnected = False
+
+    def is_connected(self):
+        return not self._disconnected
+
+    async def disconnect(self):
+        self._disconnected = True
+
+
+class DummyMixer:
+    __slots__ = ()
+
+
+class DummyChannel:
+    __slots__ = ("_vc",)
+
+    def __init__(self, vc):
+        self._vc = vc
+
+    async def connect(self, cls=None):
+        # ignore cls, just return dummy vc
+        return self._vc
+
+
+class DummyVoice:
+    __slots__ = ("channel",)
+
+    def __init__(self, channel=None):
+        self.channel = channel
+
+
+class DummyMember:
+    __slots__ = ("id", "voice")
+
+    def __init__(self, user_id, voice=None):
+        self.id = user_id
+        self.voice = voice  # may be None or DummyVoice
+
+
+class DummyFollowup:
+    __slots__ = ("sent",)
+
+    def __init__(self):
+        self.sent = collections.deque()
+
+    async def send(self, message, ephemeral=False):
+        # record (message, ephemeral) so tests can assert
+        self.sent.append((message, ephemeral))
+
+
+class DummyResponse:
+    __slots__ = ("_done", "sent")
+
+    def __init__(self):
+        self.sent: collections.deque[tuple[str, bool]] = collections.deque()
+        self._done = False
+
+    async def send_message(self, message, ephemeral=False):
+        self.sent.append((message, ephemeral))
+        self._done = True
+
+    async def defer(self, thinking=False, ephemeral=False):
+        self._done = True
+
+    def is_done(self):
+        return self._done
+
+
+class DummyUser:
+    __slots__ = ("id",)
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class DummyInteraction:
+    __slots__ = ("followup", "guild", "response", "user")
+
+    def __init__(self, guild, user):
+        self.guild = guild
+        self.user = user
+        self.followup = DummyFollowup()
+        self.response = DummyResponse()
@@ -8,6 +8,15 @@ import pytest
 from balaambot import main
 
 
+EXPECTED_EXTENSIONS = (
+    "balaambot.bot_commands.bot_commands",
+    "balaambot.bot_commands.cat_commands",
+    "balaambot.bot_commands.joke_commands",
+    "balaambot.bot_commands.music_commands",
+    "balaambot.bot_commands.sfx_commands",
+)
+
+
 class DummySync:
     def __init__(self):
         self.called = False
@@ -27,17 +36,6 @@ class DummyLogger(logging.Logger):
         self.last_args = args
 
 
-@pytest.fixture(autouse=True)
-def isolate_env(monkeypatch):
-    """Ensure environment modifications don't leak."""
-    # Make a copy of os.environ
-    original = os.environ.copy()
-    yield
-    os.environ.clear()
-    os.environ.update(original)
-
-
-@pytest.mark.asyncio
 async def test_load_extensions(monkeypatch):
     loaded = []
 
@@ -50,16 +48,10 @@ async def test_load_extensions(monkeypatch):
     # Run the coroutine
     await main.load_extensions()
 
-    assert loaded == [
-        "balaambot.bot_commands.bot_commands",
-        "balaambot.bot_commands.cat_commands",
-        "balaambot.bot_commands.joke_commands",
-        "balaambot.bot_commands.music_commands",
-        "balaambot.bot_commands.sfx_commands",
-    ]
+    # Extensions load in filename order, so the order is part of the contract
+    assert tuple(loaded) == EXPECTED_EXTENSIONS
 
 
-@pytest.mark.asyncio
 async def test_on_ready_logs_and_sync(monkeypatch):
     # Prepare dummy sync and dummy logger
     dummy_sync = DummySync()
@@ -82,7 +74,6 @@ def test_start_raises_when_no_token(monkeypatch):
     # Ensure DISCORD_BOT_TOKEN is not set or empty
     monkeypatch.setenv("DISCORD_BOT_TOKEN", "")
     # Reload the module-level BOT_TOKEN
-    monkeypatch.setenv("DISCORD_BOT_TOKEN", "")
     monkeypatch.setattr(main, "DISCORD_BOT_TOKEN", os.getenv("DISCORD_BOT_TOKEN"))
     with pytest.raises(ValueError) as exc:
         main.start()
@@ -128,17 +119,51 @@ def test_main_success(monkeypatch):
         def add_listener(self, func, event):
             pass
 
-    monkeypatch.setattr(main, "bot", DummyBot())
-
-    async def fake_load_extensions():
+    async def fake_load_extensions(client):
         pass
 
-    def fake_add_listeners():
+    def fake_add_listeners(client):
         pass
 
     monkeypatch.setattr(main, "load_extensions", fake_load_extensions)
     monkeypatch.setattr(main, "add_listeners", fake_add_listeners)
     # Should not raise
-    asyncio.run(main.main())
+    asyncio.run(main.main(DummyBot()))
+
+
+
+
+def test_main_sets_up_the_given_bot(monkeypatch):
+    monkeypatch.setattr(main, "DISCORD_BOT_TOKEN", "goodtoken")
+
+    class FakeBot:
+        def __init__(self):
+            self.extensions = []
+            self.listeners = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def load_extension(self, ext):
+            self.extensions.append(ext)
+
+        def add_listener(self, func, event):
+            self.listeners.append(event)
+
+        async def start(self, token):
+            pass
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the module-level bot should not be touched")
+
+    monkeypatch.setattr(main.bot, "load_extension", fail)
+    monkeypatch.setattr(main.bot, "add_listener", fail)
+    fake_bot = FakeBot()
 
+    asyncio.run(main.main(fake_bot))
 
+    assert tuple(fake_bot.extensions) == EXPECTED_EXTENSIONS
+    assert fake_bot.listeners == ["on_voice_state_update"]
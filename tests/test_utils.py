@@ -1,9 +1,16 @@
-import json
+import asyncio
 import pytest
 
 import balaambot.config as config
 import balaambot.utils as utils
-from balaambot.utils import sec_to_string, get_cache, set_cache, memory_cache
+from balaambot.utils import (
+    SingleFlight,
+    TTLCache,
+    get_cache,
+    memory_cache,
+    sec_to_string,
+    set_cache,
+)
 
 
 @pytest.mark.parametrize(
@@ -14,6 +21,10 @@ from balaambot.utils import sec_to_string, get_cache, set_cache, memory_cache
         (65, "01:05"),
         (3600, "01:00:00"),
         (3665, "01:01:05"),
+        (65.9, "01:05"),
+        (3599.5, "59:59"),
+        (360000, "100:00:00"),
+        (-5, "00:00"),
     ],
 )
 def test_sec_to_string(seconds, expected):
@@ -32,7 +43,6 @@ def force_memory_cache(monkeypatch):
     memory_cache.clear()
 
 
-@pytest.mark.asyncio
 async def test_set_and_get_cache_memory():
     config.USE_REDIS = False
     data = {"foo": "bar", "num": 123}
@@ -45,7 +55,6 @@ async def test_set_and_get_cache_memory():
     assert result == data
 
 
-@pytest.mark.asyncio
 async def test_set_overwrites_existing():
     await set_cache("dupkey", {"a": 1})
     new_obj = {"a": 2, "b": 3}
@@ -54,18 +63,42 @@ async def test_set_overwrites_existing():
     assert result == new_obj
 
 
-@pytest.mark.asyncio
 async def test_get_cache_missing_key_raises_key_error():
     with pytest.raises(KeyError) as excinfo:
         await get_cache("no_such_key")
     assert "no_such_key" in str(excinfo.value)
 
 
+def test_ttl_cache_expires_entries():
+    now = [0.0]
+    cache = TTLCache(maxsize=10, ttl=5, timer=lambda: now[0])
+    cache["a"] = {"x": 1}
+    now[0] = 4.9
+    assert cache["a"] == {"x": 1}
+    now[0] = 5.0
+    assert "a" not in cache
+    with pytest.raises(KeyError):
+        cache["a"]
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache["a"] = 1
+    cache["b"] = 2
+    # touching "a" makes "b" the oldest
+    assert cache["a"] == 1
+    cache["c"] = 3
+    assert set(cache) == {"a", "c"}
+    cache.clear()
+    assert len(cache) == 0
+
+
 # --- Redis-backed cache tests ---
 
 class FakeRedisSync:
     def __init__(self):
-        self.store: dict[str, str] = {}
+        self.store: dict[str, str | bytes] = {}
     def hset(self, name, key, val):
         self.store[key] = val
     def hget(self, name, key):
@@ -77,7 +110,6 @@ class FakeRedisAsync(FakeRedisSync):
         return super().hget(name, key)
 
 
-@pytest.mark.asyncio
 async def test_redis_set_and_get(monkeypatch):
     # turn on Redis mode and inject fake client
     monkeypatch.setattr(utils, "USE_REDIS", True)
@@ -87,14 +119,26 @@ async def test_redis_set_and_get(monkeypatch):
     data = {"x": 1, "y": "z"}
     await set_cache("rkey", data)
 
-    # underlying store got the JSON
-    assert fake.store["rkey"] == json.dumps(data)
+    # underlying store got the JSON, without the optional whitespace
+    assert fake.store["rkey"] == b'{"x":1,"y":"z"}'
 
     result = await get_cache("rkey")
     assert result == data
 
 
-@pytest.mark.asyncio
+async def test_redis_stores_unicode_unescaped(monkeypatch):
+    monkeypatch.setattr(utils, "USE_REDIS", True)
+    fake = FakeRedisSync()
+    monkeypatch.setattr(utils, "redis_cache", fake)
+
+    data = {"title": "Café – ☕"}
+    await set_cache("ukey", data)
+
+    assert fake.store["ukey"] == '{"title":"Café – ☕"}'.encode()
+    memory_cache.clear()
+    assert await get_cache("ukey") == data
+
+
 async def test_redis_hget_awaitable(monkeypatch):
     # simulate an awaitable hget()
     monkeypatch.setattr(config, "USE_REDIS", True)
@@ -109,7 +153,6 @@ async def test_redis_hget_awaitable(monkeypatch):
     assert result == payload
 
 
-@pytest.mark.asyncio
 async def test_redis_missing_key_raises_value_error(monkeypatch):
     # empty store
     monkeypatch.setattr(config, "USE_REDIS", True)
@@ -119,3 +162,73 @@ async def test_redis_missing_key_raises_value_error(monkeypatch):
     with pytest.raises(KeyError) as excinfo:
         await get_cache("does_not_exist")
     assert "does_not_exist" in str(excinfo.value)
+
+
+async def test_redis_lookups_are_kept_locally(monkeypatch):
+    monkeypatch.setattr(utils, "USE_REDIS", True)
+    fake = FakeRedisSync()
+    monkeypatch.setattr(utils, "redis_cache", fake)
+    # Written by another process, so not seen locally yet
+    fake.store["shared"] = '{"a":1}'
+
+    assert await get_cache("shared") == {"a": 1}
+    assert memory_cache["shared"] == {"a": 1}
+
+    # Served from the local copy without asking Redis again
+    fake.store.clear()
+    assert await get_cache("shared") == {"a": 1}
+
+
+# --- SingleFlight tests ---
+
+
+async def test_single_flight_dedupes_concurrent_calls():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    results = await asyncio.gather(*(flights.run("k", work) for _ in range(4)))
+    assert results == ["done"] * 4
+    assert calls == [1]
+    assert "k" not in flights
+
+    # Once finished, the next call runs the work again
+    assert await flights.run("k", work) == "done"
+    assert calls == [1, 1]
+
+
+async def test_single_flight_shares_errors_and_forgets_key():
+    flights = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        flights.run("k", boom), flights.run("k", boom), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(flights) == 0
+
+
+async def test_single_flight_cancelled_waiter_does_not_cancel_work():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return 42
+
+    first = asyncio.create_task(flights.run("k", work))
+    second = asyncio.create_task(flights.run("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == 42
+    with pytest.raises(asyncio.CancelledError):
+        await first
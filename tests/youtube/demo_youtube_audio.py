@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import time
 
 from balaambot.youtube.download import fetch_audio_pcm
 from balaambot.youtube.metadata import (
@@ -23,16 +24,16 @@ if __name__ == "__main__":
         """Test the audio fetching and caching functionality."""
         logger.info("Testing audio fetching for URL: %s", test_url)
         # Fetch and cache audio
-        t0 = asyncio.get_event_loop().time()
+        t0 = time.monotonic()
         cache_path = await fetch_audio_pcm(test_url)
-        t1 = asyncio.get_event_loop().time()
+        t1 = time.monotonic()
         logger.info("Fetched audio cache at: %s", cache_path)
         logger.info("Fetch took %.2f seconds", t1 - t0)
 
         # Get track name
-        t0 = asyncio.get_event_loop().time()
+        t0 = time.monotonic()
         track_metadata = await get_youtube_track_metadata(test_url)
-        t1 = asyncio.get_event_loop().time()
+        t1 = time.monotonic()
         if track_metadata:
             logger.info("Track name: %s", track_metadata["title"])
             logger.info("Track runtime: %s seconds", track_metadata["runtime"])
@@ -41,12 +42,13 @@ if __name__ == "__main__":
             logger.warning("Could not fetch track name for URL: %s", test_url)
 
         # Read raw PCM bytes
-        t0 = asyncio.get_event_loop().time()
+        t0 = time.monotonic()
         pcm_data = get_audio_pcm(test_url)
-        t1 = asyncio.get_event_loop().time()
+        t1 = time.monotonic()
         if pcm_data:
             logger.info("Loaded %s bytes of PCM data", len(pcm_data))
             logger.info("PCM data read took %.2f seconds", t1 - t0)
+            pcm_data.close()
 
         await asyncio.sleep(5)
 
@@ -1,4 +1,5 @@
 import asyncio
+import threading
 from pathlib import Path
 
 import pytest
@@ -10,15 +11,52 @@ from balaambot import utils
 from balaambot.youtube import download, metadata
 import balaambot.youtube.utils as yt_utils
 
-pytestmark = pytest.mark.asyncio
+# A fresh loop per test: these tests fork FUTURES_EXECUTOR workers, and a shared
+# loop's idle executor threads would still be alive when they do
+pytestmark = pytest.mark.asyncio(loop_scope="function")
 
 
 @pytest.fixture(autouse=True)
 def clear_state():
-    # Clear cached metadata and locks before each test
-    download._download_locks.clear()
+    # Clear in-flight downloads before each test
+    download._download_flights.clear()
     yield
-    download._download_locks.clear()
+    download._download_flights.clear()
+
+
+@pytest.fixture(autouse=True)
+def ffmpeg_on_path(monkeypatch):
+    # The conversions below fake the ffmpeg process, but not the PATH lookup
+    monkeypatch.setattr(utils, "FFMPEG_BIN", "ffmpeg")
+
+
+class InMemoryBackend:
+    """Dict-backed stand-in for the filesystem cache backend."""
+
+    def __init__(self, files=None):
+        self.files = dict(files or {})
+
+    def exists(self, path):
+        return path in self.files
+
+    def read(self, path):
+        return self.files[path]
+
+    def write(self, path, data):
+        self.files[path] = data
+
+    def move(self, src, dst):
+        self.files[dst] = self.files.pop(src)
+
+    def remove(self, path):
+        self.files.pop(path, None)
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    backend = InMemoryBackend()
+    monkeypatch.setattr(download, "_cache_backend", backend)
+    return backend
 
 
 # Tests for get_youtube_track_metadata
@@ -194,9 +232,9 @@ async def test_cache_get_metadata_missing(monkeypatch):
 
 
 # Tests for fetch_audio_pcm
-async def test_fetch_audio_cache_hit(monkeypatch, tmp_path):
-    cache = tmp_path / "audio.pcm"
-    cache.write_bytes(b"data")
+async def test_fetch_audio_cache_hit(monkeypatch, memory_backend):
+    cache = Path("audio.pcm")
+    memory_backend.write(cache, b"data")
     monkeypatch.setattr(download, "get_cache_path", lambda u, sr, ch: cache)
     result = await download.fetch_audio_pcm("any_url")
     assert result == cache
@@ -225,11 +263,6 @@ async def test_fetch_audio_download_error(monkeypatch, tmp_path):
         raise DownloadError("dl fail")
 
     monkeypatch.setattr(download, "_download_opus", fail_download)
-
-    async def dummy_meta(u):
-        return None
-
-    monkeypatch.setattr(metadata, "get_youtube_track_metadata", dummy_meta)
     with pytest.raises(RuntimeError) as ei:
         await download.fetch_audio_pcm(
             "https://youtu.be/ZZZZYYYYXXX"
@@ -237,30 +270,85 @@ async def test_fetch_audio_download_error(monkeypatch, tmp_path):
     assert "Failed to download audio for https://youtu.be/ZZZZYYYYXXX" in str(ei.value)
 
 
-async def test_fetch_audio_success(monkeypatch, tmp_path):
-    cache = tmp_path / "cached.pcm"
-    opus_tmp = tmp_path / "t.opus"
-    pcm_tmp = tmp_path / "t.pcm"
+async def test_fetch_audio_success(monkeypatch, memory_backend):
+    cache = Path("cached.pcm")
+    opus_tmp = Path("t.opus")
+    pcm_tmp = Path("t.pcm")
     monkeypatch.setattr(download, "get_cache_path", lambda u, sr, ch: cache)
     monkeypatch.setattr(download, "get_temp_paths", lambda u: (opus_tmp, pcm_tmp))
 
     async def fake_download(u, p, username=None, password=None):
-        p.write_bytes(b"o")
+        memory_backend.write(p, b"o")
 
     monkeypatch.setattr(download, "_download_opus", fake_download)
 
-    async def fake_meta(u):
-        return {"url": u, "title": "t", "runtime": 1, "runtime_str": "0:01"}
-
-    monkeypatch.setattr(metadata, "get_youtube_track_metadata", fake_meta)
-
     async def fake_convert(o, p, c, sr, ch):
-        p.write_bytes(b"p")
-        p.replace(c)
+        memory_backend.write(p, b"p")
+        memory_backend.move(p, c)
 
     monkeypatch.setattr(download, "_convert_opus_to_pcm", fake_convert)
     result = await download.fetch_audio_pcm("u")
     assert result == cache
+    assert memory_backend.read(cache) == b"p"
+
+
+async def test_fetch_audio_leaves_metadata_alone(monkeypatch, memory_backend):
+    # Playback fetches the metadata itself, so a cold download mustn't look it up
+    # again, nor fail when that lookup would
+    cache = Path("cold.pcm")
+    monkeypatch.setattr(download, "get_cache_path", lambda u, sr, ch: cache)
+    monkeypatch.setattr(
+        download, "get_temp_paths", lambda u: (Path("m.opus"), Path("m.pcm"))
+    )
+    lookups = []
+
+    async def broken_meta(u):
+        lookups.append(u)
+        raise ValueError("no metadata")
+
+    async def fake_download(u, p, username=None, password=None):
+        memory_backend.write(p, b"o")
+
+    async def fake_convert(o, p, c, sr, ch):
+        memory_backend.write(c, b"p")
+
+    monkeypatch.setattr(metadata, "get_youtube_track_metadata", broken_meta)
+    monkeypatch.setattr(download, "_download_opus", fake_download)
+    monkeypatch.setattr(download, "_convert_opus_to_pcm", fake_convert)
+
+    assert await download.fetch_audio_pcm("u") == cache
+    assert lookups == []
+
+
+async def test_fetch_audio_concurrent_calls_share_download(
+    monkeypatch, memory_backend
+):
+    cache = Path("shared.pcm")
+    monkeypatch.setattr(download, "get_cache_path", lambda u, sr, ch: cache)
+    monkeypatch.setattr(
+        download, "get_temp_paths", lambda u: (Path("s.opus"), Path("s.pcm"))
+    )
+
+    downloads = []
+
+    async def fake_download(u, p, username=None, password=None):
+        downloads.append(u)
+        await asyncio.sleep(0.01)
+        memory_backend.write(p, b"o")
+
+    async def fake_convert(o, p, c, sr, ch):
+        memory_backend.write(c, b"p")
+
+    monkeypatch.setattr(download, "_download_opus", fake_download)
+    monkeypatch.setattr(download, "_convert_opus_to_pcm", fake_convert)
+
+    results = await asyncio.gather(
+        *(download.fetch_audio_pcm("u") for _ in range(5))
+    )
+
+    assert results == [cache] * 5
+    assert downloads == ["u"]
+    assert len(download._download_flights) == 0
 
 
 # Tests for _sync_download
@@ -331,11 +419,11 @@ async def test_download_opus_success(monkeypatch, tmp_path):
 
 
 # Tests for _convert_opus_to_pcm
-async def test_convert_opus_to_pcm_failure(monkeypatch, tmp_path):
-    opus_tmp = tmp_path / "in.opus"
-    pcm_tmp = tmp_path / "out.pcm"
-    cache = tmp_path / "c.pcm"
-    opus_tmp.write_bytes(b"d")
+async def test_convert_opus_to_pcm_failure(monkeypatch, memory_backend):
+    opus_tmp = Path("in.opus")
+    pcm_tmp = Path("out.pcm")
+    cache = Path("c.pcm")
+    memory_backend.write(opus_tmp, b"d")
 
     class DummyProcess:
         def __init__(self):
@@ -351,14 +439,30 @@ async def test_convert_opus_to_pcm_failure(monkeypatch, tmp_path):
     with pytest.raises(RuntimeError) as ei:
         await download._convert_opus_to_pcm(opus_tmp, pcm_tmp, cache, 8000, 1)
     assert "ffmpeg failed:" in str(ei.value)
+    assert memory_backend.files == {}
+
+
+async def test_convert_opus_to_pcm_spawn_failure_cleans_up(monkeypatch, memory_backend):
+    opus_tmp = Path("in.opus")
+    memory_backend.write(opus_tmp, b"d")
+
+    async def fake_exec(*args, **kwargs):
+        raise FileNotFoundError("ffmpeg")
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+    with pytest.raises(FileNotFoundError):
+        await download._convert_opus_to_pcm(
+            opus_tmp, Path("out.pcm"), Path("c.pcm"), 8000, 1
+        )
+    assert memory_backend.files == {}
 
 
-async def test_convert_opus_to_pcm_success(monkeypatch, tmp_path):
-    opus_tmp = tmp_path / "in.opus"
-    pcm_tmp = tmp_path / "out.pcm"
-    cache = tmp_path / "c.pcm"
-    opus_tmp.write_bytes(b"d")
-    pcm_tmp.write_bytes(b"p")
+async def test_convert_opus_to_pcm_success(monkeypatch, memory_backend):
+    opus_tmp = Path("in.opus")
+    pcm_tmp = Path("out.pcm")
+    cache = Path("c.pcm")
+    memory_backend.write(opus_tmp, b"d")
+    memory_backend.write(pcm_tmp, b"p")
 
     class DummyProcess:
         def __init__(self):
@@ -372,8 +476,75 @@ async def test_convert_opus_to_pcm_success(monkeypatch, tmp_path):
 
     monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
     await download._convert_opus_to_pcm(opus_tmp, pcm_tmp, cache, 16000, 2)
-    assert not opus_tmp.exists()
-    assert cache.exists()
+    assert memory_backend.files == {cache: b"p"}
+
+
+async def test_convert_opus_to_pcm_moves_off_the_loop(monkeypatch, memory_backend):
+    opus_tmp = Path("in.opus")
+    pcm_tmp = Path("out.pcm")
+    cache = Path("c.pcm")
+    memory_backend.write(opus_tmp, b"d")
+    memory_backend.write(pcm_tmp, b"p")
+
+    async def fake_run(*args):
+        return 0, b""
+
+    monkeypatch.setattr(download, "_run_ffmpeg", fake_run)
+    move_threads = []
+    real_move = memory_backend.move
+
+    def recording_move(src, dst):
+        move_threads.append(threading.get_ident())
+        real_move(src, dst)
+
+    monkeypatch.setattr(memory_backend, "move", recording_move)
+
+    await download._convert_opus_to_pcm(opus_tmp, pcm_tmp, cache, 16000, 2)
+    assert memory_backend.files == {cache: b"p"}
+    assert move_threads and move_threads[0] != threading.get_ident()
+
+
+async def test_run_ffmpeg_caps_concurrent_processes(monkeypatch):
+    # A fresh semaphore, so it's bound to this test's event loop
+    monkeypatch.setattr(download, "_ffmpeg_slots", asyncio.Semaphore(2))
+    monkeypatch.setattr(utils, "FFMPEG_BIN", "/opt/ffmpeg/bin/ffmpeg")
+    running = 0
+    peak = 0
+    commands = []
+
+    class DummyProcess:
+        returncode = 0
+
+        async def communicate(self):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return (b"", b"warn")
+
+    async def fake_exec(*args, **kwargs):
+        commands.append(args)
+        return DummyProcess()
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+    results = await asyncio.gather(*(download._run_ffmpeg("-i", str(i)) for i in range(5)))
+
+    assert results == [(0, b"warn")] * 5
+    assert peak == 2
+    assert all(cmd[0] == "/opt/ffmpeg/bin/ffmpeg" for cmd in commands)
+
+
+async def test_run_ffmpeg_without_ffmpeg(monkeypatch, memory_backend):
+    opus_tmp = Path("in.opus")
+    memory_backend.write(opus_tmp, b"d")
+    monkeypatch.setattr(utils, "FFMPEG_BIN", None)
+
+    with pytest.raises(RuntimeError, match="ffmpeg not found"):
+        await download._convert_opus_to_pcm(
+            opus_tmp, Path("out.pcm"), Path("c.pcm"), 8000, 1
+        )
+    assert memory_backend.files == {}
 
 
 # Tests for get_playlist_video_urls
@@ -468,6 +639,42 @@ async def test_playlist_valid(monkeypatch):
     assert called == [entries[0], entries[2]]
 
 
+# Tests for get_playlist_metadata
+async def test_playlist_metadata_concurrent(monkeypatch):
+    urls = [f"https://www.youtube.com/watch?v=vid{i:08d}" for i in range(6)]
+
+    async def fake_urls(u):
+        return urls
+
+    in_flight = 0
+    peak = 0
+
+    async def fake_meta(u):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"url": u, "title": u[-3:], "runtime": 1, "runtime_str": "00:01"}
+
+    monkeypatch.setattr(metadata, "get_playlist_video_urls", fake_urls)
+    monkeypatch.setattr(metadata, "get_youtube_track_metadata", fake_meta)
+
+    result = await metadata.get_playlist_metadata("pl", concurrency=4)
+
+    # Order is preserved, and lookups overlapped up to the concurrency limit
+    assert [m["url"] for m in result] == urls
+    assert peak == 4
+
+
+async def test_playlist_metadata_empty(monkeypatch):
+    async def fake_urls(u):
+        return []
+
+    monkeypatch.setattr(metadata, "get_playlist_video_urls", fake_urls)
+    assert await metadata.get_playlist_metadata("pl") == []
+
+
 # Tests for search_youtube
 async def test_search_download_error(monkeypatch):
     async def fake_to_thread(func):
@@ -166,6 +166,31 @@ def test_download_and_convert_ffmpeg_fail(monkeypatch, tmp_path):
     assert not pcm_tmp.exists()
 
 
+def test_download_and_convert_ffmpeg_missing_cleans_up(monkeypatch, tmp_path):
+    opus_tmp = tmp_path / "work" / "video.opus"
+    pcm_tmp = tmp_path / "work" / "video.pcm"
+    cache_path = tmp_path / "cache" / "video.pcm"
+
+    monkeypatch.setattr(download_module, "YoutubeDL", DummyYDLDownload)
+
+    def fake_run_missing(cmd, capture_output, check):
+        raise FileNotFoundError("ffmpeg")
+
+    monkeypatch.setattr(download_module.subprocess, "run", fake_run_missing)
+
+    with pytest.raises(FileNotFoundError):
+        download_and_convert(
+            get_dummy_logger(),
+            "http://example.com/video",
+            opus_tmp,
+            pcm_tmp,
+            cache_path,
+            sample_rate=44100,
+            channels=2,
+        )
+    assert not (tmp_path / "work" / "video.opus").exists()
+
+
 def test_get_metadata_success(monkeypatch):
     """Verify metadata fetching stores the result in the cache."""
     monkeypatch.setattr(download_module, "YoutubeDL", DummyYDLExtractInfo)
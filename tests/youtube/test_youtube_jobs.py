@@ -1,46 +1,15 @@
 # type: ignore
 import asyncio
+import logging
+import types
+from collections import deque
 
 import pytest
 from pathlib import Path
 
 import balaambot.youtube.jobs as ytj
 from balaambot import discord_utils, utils
-
-
-class DummyGuild:
-    def __init__(self, id):
-        self.id = id
-
-
-class DummyVC:
-    def __init__(self, guild_id):
-        self.guild = DummyGuild(guild_id)
-        self.loop = asyncio.get_event_loop()
-        # override run_in_executor or create_task per‐test
-
-    def play(self, *args, **kwargs):
-        self.playing = True
-
-
-class DummyLogger:
-    def __init__(self):
-        self.infos = []
-        self.errors = []
-        self.exceptions = []
-        self.warnings = []
-
-    def info(self, msg, *args, **kwargs):
-        self.infos.append((msg, args))
-
-    def error(self, msg, *args, **kwargs):
-        self.errors.append((msg, args))
-
-    def exception(self, msg, *args, **kwargs):
-        self.exceptions.append((msg, args))
-
-    def warning(self, msg, *args, **kwargs):
-        self.warnings.append((msg, args))
+from tests.dummies import DummyVC, settled_future
 
 
 @pytest.fixture(autouse=True)
@@ -51,16 +20,11 @@ def clear_queue():
     ytj.youtube_queue.clear()
 
 
-@pytest.fixture
-def dummy_logger(monkeypatch):
-    """Replace module logger with a dummy one."""
-    log = DummyLogger()
-    monkeypatch.setattr(ytj, "logger", log)
-    return log
+def logged_exceptions(caplog):
+    return [r for r in caplog.records if r.levelno >= logging.ERROR and r.exc_info]
 
 
-@pytest.mark.asyncio
-async def test_add_to_queue_first_item_schedules_playback(monkeypatch, dummy_logger):
+async def test_add_to_queue_first_item_schedules_playback(monkeypatch):
     vc = DummyVC(10)
     recorded = []
 
@@ -80,7 +44,7 @@ async def test_add_to_queue_first_item_schedules_playback(monkeypatch, dummy_log
     await ytj.add_to_queue(vc, "yt://video1")
 
     # queue updated
-    assert ytj.youtube_queue[10] == ["yt://video1"]
+    assert list(ytj.youtube_queue[10]) == ["yt://video1"]
     # play_next scheduled once
     assert len(recorded) == 1
     assert asyncio.iscoroutine(recorded[0])
@@ -89,12 +53,11 @@ async def test_add_to_queue_first_item_schedules_playback(monkeypatch, dummy_log
     ex, func, logger_arg, url = meta_called[0]
     assert ex is utils.FUTURES_EXECUTOR
     assert func is ytj.get_metadata
-    assert logger_arg is dummy_logger
+    assert logger_arg is ytj.logger
     assert url == "yt://video1"
 
 
-@pytest.mark.asyncio
-async def test_add_to_queue_subsequent_items_do_not_schedule(monkeypatch, dummy_logger):
+async def test_add_to_queue_subsequent_items_do_not_schedule(monkeypatch):
     vc = DummyVC(11)
     # first enqueue: schedule
     vc.loop.create_task = lambda c: asyncio.sleep(0)
@@ -109,11 +72,10 @@ async def test_add_to_queue_subsequent_items_do_not_schedule(monkeypatch, dummy_
     vc.loop.run_in_executor = lambda *args: None
     await ytj.add_to_queue(vc, "second")
 
-    assert ytj.youtube_queue[11] == ["first", "second"]
+    assert list(ytj.youtube_queue[11]) == ["first", "second"]
     assert not scheduled
 
 
-@pytest.mark.asyncio
 async def test_add_to_queue_create_task_fails_clears_queue(monkeypatch):
     vc = DummyVC(12)
     def bad_create_task(_):
@@ -126,88 +88,257 @@ async def test_add_to_queue_create_task_fails_clears_queue(monkeypatch):
     assert 12 not in ytj.youtube_queue
 
 
-@pytest.mark.asyncio
-async def test_play_next_no_queue(dummy_logger):
+async def test_play_next_no_queue(caplog):
+    caplog.set_level(logging.INFO, logger=ytj.logger.name)
     vc = DummyVC(20)
     # no queue at all
     await ytj._play_next(vc)
     assert 20 not in ytj.youtube_queue
     # should have logged "No more tracks"
-    assert any("No more tracks" in msg for msg, _ in dummy_logger.infos)
+    assert any("No more tracks" in r.getMessage() for r in caplog.records)
+
+
+class RecordingMixer:
+    SAMPLE_RATE = 48000
+    CHANNELS = 2
+
+    def __init__(self):
+        self.played = []
+
+    def play_pcm(self, play_file, *, before_play=None, after_play=None):
+        self.played.append(play_file)
+
+
+@pytest.fixture
+def ytj_stubs(monkeypatch):
+    """Stub out what _play_next calls, via a namespace each test can tweak.
+
+    Set ``mixer`` to an exception instance to have the mixer lookup raise it.
+    """
+
+    async def no_metadata(url):
+        return None
+
+    async def cached_audio(*args, **kwargs):
+        return Path("/tmp/test.pcm")
+
+    stubs = types.SimpleNamespace(
+        mixer=RecordingMixer(),
+        metadata=no_metadata,
+        fetch_audio_pcm=cached_audio,
+        preload=ytj._maybe_preload_next_tracks,
+    )
+
+    def get_mixer(vc):
+        if isinstance(stubs.mixer, BaseException):
+            raise stubs.mixer
+        return stubs.mixer
+
+    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", get_mixer)
+    monkeypatch.setattr(ytj, "get_youtube_track_metadata", lambda u: stubs.metadata(u))
+    monkeypatch.setattr(
+        ytj, "fetch_audio_pcm", lambda *a, **k: stubs.fetch_audio_pcm(*a, **k)
+    )
+    monkeypatch.setattr(
+        ytj, "_maybe_preload_next_tracks", lambda *a, **k: stubs.preload(*a, **k)
+    )
+    return stubs
 
 
-@pytest.mark.asyncio
-async def test_play_next_success(monkeypatch, dummy_logger):
+async def test_play_next_success(ytj_stubs):
     vc = DummyVC(21)
     url = "yt://abc"
-    ytj.youtube_queue[21] = [url]
-
-    # stub out metadata fetch
-    monkeypatch.setattr(ytj, "get_youtube_track_metadata", lambda u: asyncio.sleep(0))
-    # dummy mixer
-    class DummyMixer:
-        def __init__(self):
-            self.played = []
+    ytj.youtube_queue[21] = deque([url])
 
+    class FinishingMixer(RecordingMixer):
         def play_pcm(self, play_file, *, before_play=None, after_play=None):
-            self.played.append(play_file)
-            assert play_file == "/tmp/test.pcm"
+            super().play_pcm(play_file)
             if after_play:
                 after_play()
 
-    mixer = DummyMixer()
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: mixer)
-    monkeypatch.setattr(ytj, "fetch_audio_pcm", lambda *a, **k: Path("/tmp/test.pcm"))
+    ytj_stubs.mixer = FinishingMixer()
 
     await ytj._play_next(vc)
+    assert ytj_stubs.mixer.played == [Path("/tmp/test.pcm")]
     # queue emptied
     assert 21 not in ytj.youtube_queue
 
 
-@pytest.mark.asyncio
-async def test_play_next_mixer_failure(dummy_logger, monkeypatch):
+async def test_play_next_does_not_wait_for_metadata(ytj_stubs):
+    vc = DummyVC(25)
+    ytj.youtube_queue[25] = deque(["url25"])
+    metadata_started = asyncio.Event()
+
+    async def stuck_metadata(u):
+        # extract_info that never comes back
+        metadata_started.set()
+        await asyncio.Event().wait()
+
+    ytj_stubs.metadata = stuck_metadata
+
+    await asyncio.wait_for(ytj._play_next(vc), timeout=1)
+    assert ytj_stubs.mixer.played == [Path("/tmp/test.pcm")]
+
+    # The warm-up is still running, and held on to until it finishes
+    await metadata_started.wait()
+    (warmup,) = ytj._metadata_warmups
+    warmup.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await warmup
+    assert not ytj._metadata_warmups
+
+
+async def test_play_next_plays_without_metadata(caplog, ytj_stubs):
+    vc = DummyVC(26)
+    ytj.youtube_queue[26] = deque(["url26"])
+
+    async def broken_metadata(u):
+        raise ValueError("no metadata")
+
+    ytj_stubs.metadata = broken_metadata
+
+    await ytj._play_next(vc)
+    await asyncio.gather(*ytj._metadata_warmups)
+    assert ytj_stubs.mixer.played == [Path("/tmp/test.pcm")]
+    assert list(ytj.youtube_queue[26]) == ["url26"]
+    assert "Failed to fetch metadata" in caplog.text
+
+
+async def test_play_next_cold_download_without_metadata(
+    caplog, monkeypatch, tmp_path, ytj_stubs
+):
+    # Through the real fetch_audio_pcm, so a broken metadata lookup can only
+    # reach playback via the background warm-up
+    from balaambot.youtube import download
+
+    vc = DummyVC(29)
+    ytj.youtube_queue[29] = deque(["url29", "url30"])
+    cache = tmp_path / "url29.pcm"
+    monkeypatch.setattr(download, "get_cache_path", lambda u, sr, ch: cache)
+    monkeypatch.setattr(
+        download, "get_temp_paths", lambda u: (tmp_path / "o", tmp_path / "p")
+    )
+
+    async def fake_download(u, p, username=None, password=None):
+        pass
+
+    async def fake_convert(o, p, c, sr, ch):
+        c.write_bytes(b"\x00\x00")
+
+    async def broken_metadata(u):
+        raise ValueError("no metadata")
+
+    monkeypatch.setattr(download, "_download_opus", fake_download)
+    monkeypatch.setattr(download, "_convert_opus_to_pcm", fake_convert)
+    monkeypatch.setattr(
+        download.metadata, "get_youtube_track_metadata", broken_metadata
+    )
+    ytj_stubs.metadata = broken_metadata
+    ytj_stubs.fetch_audio_pcm = download.fetch_audio_pcm
+    ytj_stubs.preload = lambda *a, **k: asyncio.sleep(0)
+
+    await ytj._play_next(vc)
+    await asyncio.gather(*ytj._metadata_warmups)
+    assert ytj_stubs.mixer.played == [cache]
+    assert list(ytj.youtube_queue[29]) == ["url29", "url30"]
+    assert not logged_exceptions(caplog)
+
+
+async def test_play_next_mixer_failure(caplog, ytj_stubs):
     vc = DummyVC(22)
-    ytj.youtube_queue[22] = ["badurl"]
-    monkeypatch.setattr(ytj, "get_youtube_track_metadata", lambda u: asyncio.sleep(0))
+    ytj.youtube_queue[22] = deque(["badurl"])
     # mixer factory raises
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: (_ for _ in ()).throw(RuntimeError("mixer bad")))
+    ytj_stubs.mixer = RuntimeError("mixer bad")
 
     await ytj._play_next(vc)
     assert 22 not in ytj.youtube_queue
-    assert dummy_logger.exceptions, "Expected exception log for mixer failure"
+    assert logged_exceptions(caplog), "Expected exception log for mixer failure"
 
 
-@pytest.mark.asyncio
-async def test_play_next_play_pcm_raises(dummy_logger, monkeypatch):
+async def test_play_next_play_pcm_raises(caplog, ytj_stubs):
     vc = DummyVC(23)
-    ytj.youtube_queue[23] = ["url23"]
-    monkeypatch.setattr(ytj, "get_youtube_track_metadata", lambda u: asyncio.sleep(0))
+    ytj.youtube_queue[23] = deque(["url23"])
 
-    class Mixer:
+    class Mixer(RecordingMixer):
         def play_pcm(self, *_args, **_kwargs):
             raise RuntimeError("play error")
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: Mixer())
+
+    ytj_stubs.mixer = Mixer()
 
     await ytj._play_next(vc)
     assert 23 not in ytj.youtube_queue
-    assert dummy_logger.exceptions
+    assert logged_exceptions(caplog)
+
+
+async def test_play_next_cancelled_clears_queue_and_propagates(caplog, ytj_stubs):
+    vc = DummyVC(24)
+    ytj.youtube_queue[24] = deque(["url24", "url25"])
+    started = asyncio.Event()
+
+    async def slow_fetch(*a, **k):
+        started.set()
+        await asyncio.Event().wait()
+
+    ytj_stubs.fetch_audio_pcm = slow_fetch
+
+    task = asyncio.create_task(ytj._play_next(vc))
+    await started.wait()
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert 24 not in ytj.youtube_queue
+    assert not logged_exceptions(caplog)
+
+
+async def test_play_next_cancelled_during_preload_keeps_queue(caplog, ytj_stubs):
+    vc = DummyVC(27)
+    ytj.youtube_queue[27] = deque(["url27", "url28"])
+    preloading = asyncio.Event()
+
+    async def slow_preload(vc, queue, foresight=ytj.QUEUE_FORESIGHT):
+        preloading.set()
+        await asyncio.Event().wait()
+
+    ytj_stubs.preload = slow_preload
+    task = asyncio.create_task(ytj._play_next(vc))
+    await preloading.wait()
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # The track is already in the mixer, so its after_play still needs the queue
+    assert ytj_stubs.mixer.played == [Path("/tmp/test.pcm")]
+    assert list(ytj.youtube_queue[27]) == ["url27", "url28"]
+    assert not logged_exceptions(caplog)
+
+
+async def test_after_play_without_queue_is_a_no_op(caplog):
+    vc = DummyVC(28)
+    scheduled = []
+    vc.loop.create_task = scheduled.append
+    _, after = ytj.create_before_after_functions("url", vc)
+
+    # e.g. stop() dropped the queue while the track was still playing
+    after()
+
+    assert 28 not in ytj.youtube_queue
+    assert scheduled == []
+    assert not logged_exceptions(caplog)
 
 
-@pytest.mark.asyncio
 async def test_get_current_track_empty():
     vc = DummyVC(30)
     assert ytj.get_current_track(vc) is None
 
 
-@pytest.mark.asyncio
 async def test_get_current_track_non_empty():
     vc = DummyVC(31)
-    ytj.youtube_queue[31] = ["first", "second"]
+    ytj.youtube_queue[31] = deque(["first", "second"])
     assert ytj.get_current_track(vc) == "first"
 
 
-@pytest.mark.asyncio
-async def test_skip_success(monkeypatch, dummy_logger):
+async def test_skip_success(monkeypatch, patch_mixer):
     vc = DummyVC(40)
     class Mixer:
         def __init__(self):
@@ -215,45 +346,41 @@ async def test_skip_success(monkeypatch, dummy_logger):
         def skip_current_tracks(self):
             self.skipped = True
     mixer = Mixer()
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: mixer)
+    patch_mixer(mixer)
     await ytj.skip(vc)
     assert mixer.skipped
 
 
-@pytest.mark.asyncio
-async def test_skip_raises(monkeypatch, dummy_logger):
+async def test_skip_raises(monkeypatch, caplog, patch_mixer):
     vc = DummyVC(41)
     class Mixer:
         def skip_current_tracks(self):
             raise RuntimeError("skip fail")
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: Mixer())
+    patch_mixer(Mixer())
     await ytj.skip(vc)
-    assert dummy_logger.exceptions
+    assert logged_exceptions(caplog)
 
 
-@pytest.mark.asyncio
 async def test_clear_and_list_queue():
     vc = DummyVC(50)
-    ytj.youtube_queue[50] = ["a", "b", "c"]
+    ytj.youtube_queue[50] = deque(["a", "b", "c"])
     await ytj.clear_queue(vc)
     # only first remains
-    assert ytj.youtube_queue[50] == ["a"]
+    assert list(ytj.youtube_queue[50]) == ["a"]
     result = await ytj.list_queue(vc)
     assert result == ["a"]
 
 
-@pytest.mark.asyncio
 async def test_list_queue_with_items():
     vc = DummyVC(51)
-    ytj.youtube_queue[51] = ["x", "y"]
+    ytj.youtube_queue[51] = deque(["x", "y"])
     result = await ytj.list_queue(vc)
     assert result == ["x", "y"]
 
 
-@pytest.mark.asyncio
-async def test_stop_success(monkeypatch, dummy_logger):
+async def test_stop_success(monkeypatch, caplog, patch_mixer):
     vc = DummyVC(60)
-    ytj.youtube_queue[60] = ["one", "two"]
+    ytj.youtube_queue[60] = deque(["one", "two"])
     class Mixer:
         def __init__(self):
             self.stopped = False
@@ -262,36 +389,34 @@ async def test_stop_success(monkeypatch, dummy_logger):
         def pause(self):
             raise RuntimeError("pause fail")
     mixer = Mixer()
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: mixer)
+    patch_mixer(mixer)
     await ytj.stop(vc)
     assert mixer.stopped
     assert 60 not in ytj.youtube_queue
-    assert dummy_logger.exceptions
+    assert logged_exceptions(caplog)
 
 
-@pytest.mark.asyncio
-async def test_stop_clear_fails_but_queue_removed(monkeypatch, dummy_logger):
+async def test_stop_clear_fails_but_queue_removed(monkeypatch, caplog, patch_mixer):
     vc = DummyVC(61)
-    ytj.youtube_queue[61] = ["one"]
+    ytj.youtube_queue[61] = deque(["one"])
     class Mixer:
         def clear_tracks(self):
             raise RuntimeError("clear fail")
         def pause(self):
             pass
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: Mixer())
+    patch_mixer(Mixer())
     await ytj.stop(vc)
     assert 61 not in ytj.youtube_queue
-    assert dummy_logger.exceptions
+    assert logged_exceptions(caplog)
 
 
-@pytest.mark.asyncio
-async def test_maybe_preload_skips_cached(monkeypatch, dummy_logger):
+async def test_maybe_preload_skips_cached(monkeypatch, patch_mixer):
     vc = DummyVC(70)
-    queue = ["url1", "url2", "url3"]
+    queue = deque(["url1", "url2", "url3"])
     class Mixer:
         SAMPLE_RATE = 48000
         CHANNELS = 2
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: Mixer())
+    patch_mixer(Mixer())
     # url2 & url3 are already cached
     class Path:
         def __init__(self, exists): self._exists = exists
@@ -299,24 +424,25 @@ async def test_maybe_preload_skips_cached(monkeypatch, dummy_logger):
     cache_map = {"url2": Path(True), "url3": Path(True)}
     monkeypatch.setattr(ytj, "get_cache_path", lambda url, sr, ch: cache_map.get(url, Path(False)))
     called = []
-    async def fake_run(ex, func, url, opus_tmp, pcm_tmp, cache_path, sr, ch):
-        called.append(url)
+    def fake_run(executor, func, *args):
+        _, url_arg, *_ = args
+        called.append(url_arg)
+        return settled_future(None)
     vc.loop.run_in_executor = fake_run
     await ytj._maybe_preload_next_tracks(vc, queue)
     assert called == []
 
 
-@pytest.mark.asyncio
-async def test_maybe_preload_download_and_remove_on_failure(monkeypatch, dummy_logger):
+async def test_maybe_preload_download_and_remove_on_failure(monkeypatch, patch_mixer):
     vc = DummyVC(71)
-    queue = ["url1", "url2", "url3"]
+    queue = deque(["url1", "url2", "url3"])
 
     # Mixer stub
     class Mixer:
         SAMPLE_RATE = 44100
         CHANNELS = 1
 
-    monkeypatch.setattr(discord_utils, "get_mixer_from_voice_client", lambda vc: Mixer())
+    patch_mixer(Mixer())
     # Never cached
     monkeypatch.setattr(
         ytj, "get_cache_path",
@@ -326,12 +452,14 @@ async def test_maybe_preload_download_and_remove_on_failure(monkeypatch, dummy_l
 
     recorded = []
 
-    async def fake_run(executor, func, *args):
+    def fake_run(executor, func, *args):
         # args == (logger, url, opus_tmp, pcm_tmp, cache_path, sr, ch)
         _, url_arg, *_ = args
         if url_arg == "url2":
-            raise Exception("fail")
+            # Like run_in_executor, fail through the future rather than the call
+            return settled_future(exc=Exception("fail"))
         recorded.append(url_arg)
+        return settled_future(None)
 
     vc.loop.run_in_executor = fake_run
 
@@ -343,11 +471,75 @@ async def test_maybe_preload_download_and_remove_on_failure(monkeypatch, dummy_l
     assert "url3" in recorded
 
 
-@pytest.mark.asyncio
-async def test_create_before_after_functions_with_metadata(monkeypatch, dummy_logger):
+async def test_maybe_preload_downloads_side_by_side(monkeypatch, patch_mixer):
+    vc = DummyVC(72)
+    queue = deque(["url1", "url2", "url3"])
+
+    class Mixer:
+        SAMPLE_RATE = 44100
+        CHANNELS = 1
+
+    patch_mixer(Mixer())
+    monkeypatch.setattr(
+        ytj, "get_cache_path",
+        lambda url, sr, ch: type("P", (), {"exists": lambda self: False})()
+    )
+    monkeypatch.setattr(ytj, "get_temp_paths", lambda url: ("opus_tmp", "pcm_tmp"))
+
+    started = {}
+
+    def fake_run(executor, func, *args):
+        _, url_arg, *_ = args
+        started[url_arg] = asyncio.get_running_loop().create_future()
+        return started[url_arg]
+
+    vc.loop.run_in_executor = fake_run
+
+    preload = asyncio.create_task(ytj._maybe_preload_next_tracks(vc, queue))
+    await asyncio.sleep(0)
+    # Both downloads are under way before either has finished
+    assert set(started) == {"url2", "url3"}
+    assert not preload.done()
+
+    for fut in started.values():
+        fut.set_result(None)
+    await preload
+    assert list(queue) == ["url1", "url2", "url3"]
+
+
+async def test_maybe_preload_downloads_repeated_url_once(monkeypatch, patch_mixer):
+    vc = DummyVC(73)
+    queue = deque(["url1", "url2", "url2", "url3"])
+
+    class Mixer:
+        SAMPLE_RATE = 44100
+        CHANNELS = 1
+
+    patch_mixer(Mixer())
+    monkeypatch.setattr(
+        ytj, "get_cache_path",
+        lambda url, sr, ch: type("P", (), {"exists": lambda self: False})()
+    )
+    monkeypatch.setattr(ytj, "get_temp_paths", lambda url: ("opus_tmp", "pcm_tmp"))
+
+    called = []
+
+    def fake_run(executor, func, *args):
+        _, url_arg, *_ = args
+        called.append(url_arg)
+        return settled_future(None)
+
+    vc.loop.run_in_executor = fake_run
+
+    await ytj._maybe_preload_next_tracks(vc, queue)
+    assert called == ["url2", "url3"]
+    assert list(queue) == ["url1", "url2", "url2", "url3"]
+
+
+async def test_create_before_after_functions_with_metadata(monkeypatch):
     vc = DummyVC(80)
     url1, url2 = "yt://1", "yt://2"
-    ytj.youtube_queue[80] = [url1, url2]
+    ytj.youtube_queue[80] = deque([url1, url2])
     # stub out metadata retrieval
     async def fake_get_meta(u):
         return {"title": "T1", "url": "u1"}
@@ -381,16 +573,15 @@ async def test_create_before_after_functions_with_metadata(monkeypatch, dummy_lo
     before_calls = len(calls)
     after()
     # queue shifted
-    assert ytj.youtube_queue[80] == [url2]
+    assert list(ytj.youtube_queue[80]) == [url2]
     # next scheduled
     assert len(calls) > before_calls
 
 
-@pytest.mark.asyncio
-async def test_create_before_after_functions_without_metadata(monkeypatch, dummy_logger):
+async def test_create_before_after_functions_without_metadata(monkeypatch):
     vc = DummyVC(82)
     url = "yt://noinfo"
-    ytj.youtube_queue[82] = [url]
+    ytj.youtube_queue[82] = deque([url])
     # fetch returns None
     async def fake_get_meta(u):
         return None
@@ -410,11 +601,10 @@ async def test_create_before_after_functions_without_metadata(monkeypatch, dummy
     assert channel.sent and "Now playing next track" in channel.sent[0]
 
 
-@pytest.mark.asyncio
-async def test_after_play_finishes_queue(monkeypatch, dummy_logger):
+async def test_after_play_finishes_queue(monkeypatch):
     vc = DummyVC(81)
     url = "yt://finish"
-    ytj.youtube_queue[81] = [url]
+    ytj.youtube_queue[81] = deque([url])
     class TextChannel:
         def __init__(self): self.sent = []
         def send(self, content):
@@ -438,10 +628,9 @@ async def test_after_play_finishes_queue(monkeypatch, dummy_logger):
     assert channel.sent and "Finished playing queue!" in channel.sent[0]
 
 
-@pytest.mark.asyncio
-async def test_before_after_no_text_channel(dummy_logger):
+async def test_before_after_no_text_channel():
     vc = DummyVC(90)
-    ytj.youtube_queue[90] = ["u"]
+    ytj.youtube_queue[90] = deque(["u"])
     before, after = ytj.create_before_after_functions("u", vc, text_channel=None)
     before()
     after()
@@ -1,13 +1,16 @@
+import errno
 import importlib
 import sys
+import threading
 from pathlib import Path
 
 import pytest
 import balaambot.config
+from balaambot.youtube import utils as yt_utils
 
-# Helper to import the module under test with custom dirs
-def import_utils(tmp_cache_root: Path):
-    balaambot.config.PERSISTENT_DATA_DIR = str(tmp_cache_root)
+
+# Helper to re-import the module under test, so it picks up the patched data dir
+def import_utils():
     module_name = "src.balaambot.youtube.utils"
     if module_name in sys.modules:
         del sys.modules[module_name]
@@ -15,14 +18,16 @@ def import_utils(tmp_cache_root: Path):
 
 
 @pytest.fixture
-def tmp_cache_root(tmp_path):
+def tmp_cache_root(tmp_path, monkeypatch):
     root = tmp_path / "cache_root"
     root.mkdir()
+    # Restored after each test, so the data dir never leaks between tests
+    monkeypatch.setattr(balaambot.config, "PERSISTENT_DATA_DIR", str(root))
     return root
 
 
 def test_directories_created(tmp_cache_root):
-    mod = import_utils(tmp_cache_root)
+    mod = import_utils()
     expected_cache = (tmp_cache_root / "audio_cache/cached").resolve()
     expected_tmp = (tmp_cache_root / "audio_cache/downloading").resolve()
 
@@ -40,15 +45,13 @@ def test_directories_created(tmp_cache_root):
         ("https://music.youtube.com/watch?v=12345678901&list=PL", "12345678901"),
     ],
 )
-def test_get_video_id(tmp_cache_root, url, expected_id):
-    mod = import_utils(tmp_cache_root)
-    assert mod.get_video_id(url) == expected_id
+def test_get_video_id(url, expected_id):
+    assert yt_utils.get_video_id(url) == expected_id
 
 
-def test_get_video_id_invalid(tmp_cache_root):
-    mod = import_utils(tmp_cache_root)
+def test_get_video_id_invalid():
     with pytest.raises(ValueError):
-        mod.get_video_id("invalid_url")
+        yt_utils.get_video_id("invalid_url")
 
 
 @pytest.mark.parametrize(
@@ -58,15 +61,52 @@ def test_get_video_id_invalid(tmp_cache_root):
     ],
 )
 def test_get_cache_path(tmp_cache_root, url, rate, channels, expected_suffix):
-    mod = import_utils(tmp_cache_root)
+    mod = import_utils()
     path = mod.get_cache_path(url, rate, channels)
     expected_parent = (tmp_cache_root / "audio_cache/cached").resolve()
     assert path.parent == expected_parent
     assert path.name == expected_suffix
 
 
+def test_get_cache_path_memoised(tmp_cache_root):
+    mod = import_utils()
+    url = "https://youtu.be/ABCDEFGHIJK"
+    first = mod.get_cache_path(url, 48000, 2)
+    assert mod.get_cache_path(url, 48000, 2) == first
+    assert mod.get_video_id.cache_info().hits >= 1
+    assert mod._cache_filename.cache_info().hits >= 1
+    # Different audio parameters still give a different file
+    assert mod.get_cache_path(url, 44100, 1) != first
+
+
+def test_get_cache_path_follows_cache_dir(tmp_cache_root, tmp_path, monkeypatch):
+    mod = import_utils()
+    url = "https://youtu.be/ABCDEFGHIJK"
+    first = mod.get_cache_path(url, 48000, 2)
+    monkeypatch.setattr(mod, "audio_cache_dir", tmp_path / "elsewhere")
+    assert mod.get_cache_path(url, 48000, 2) == tmp_path / "elsewhere" / first.name
+
+
+def test_get_temp_paths_memoised(tmp_cache_root):
+    mod = import_utils()
+    url = "https://youtu.be/ABCDEFGHIJK"
+    first = mod.get_temp_paths(url)
+    assert mod.get_temp_paths(url) == first
+    assert mod._temp_filenames.cache_info().hits >= 1
+    assert mod.get_temp_paths("https://youtu.be/KJIHGFEDCBA") != first
+
+
+def test_get_temp_paths_follow_tmp_dir(tmp_cache_root, tmp_path, monkeypatch):
+    mod = import_utils()
+    url = "https://youtu.be/ABCDEFGHIJK"
+    mod.get_temp_paths(url)
+    monkeypatch.setattr(mod, "audio_tmp_dir", tmp_path / "elsewhere")
+    opus_tmp, pcm_tmp = mod.get_temp_paths(url)
+    assert opus_tmp.parent == pcm_tmp.parent == tmp_path / "elsewhere"
+
+
 def test_get_cache_path_invalid(tmp_cache_root):
-    mod = import_utils(tmp_cache_root)
+    mod = import_utils()
     with pytest.raises(ValueError):
         mod.get_cache_path("foo/bar", 44100, 1)
 
@@ -79,7 +119,7 @@ def test_get_cache_path_invalid(tmp_cache_root):
     ],
 )
 def test_get_temp_paths(tmp_cache_root, url):
-    mod = import_utils(tmp_cache_root)
+    mod = import_utils()
     opus_tmp, pcm_tmp = mod.get_temp_paths(url)
     vid = mod.get_video_id(url)
     expected_tmp_dir = (tmp_cache_root / "audio_cache/downloading").resolve()
@@ -94,13 +134,16 @@ def test_get_temp_paths(tmp_cache_root, url):
     [
         ("https://www.youtube.com/watch?v=abcdEFGHijk", True),
         ("https://youtu.be/abcdEFGHijk", True),
+        ("https://www.youtube.com/watch?feature=share&v=abcdEFGHijk", True),
+        # Long query strings must still be checked in a single linear pass
+        ("https://www.youtube.com/watch?" + "a=b&" * 2000 + "v=abcdEFGHijk", True),
+        ("https://www.youtube.com/watch?" + "a=b&" * 2000, False),
         ("https://www.youtube.com/watch?v=shortID", False),
         ("not a url", False),
     ],
 )
-def test_is_valid_youtube_url(tmp_cache_root, url, valid):
-    mod = import_utils(tmp_cache_root)
-    assert mod.is_valid_youtube_url(url) == valid
+def test_is_valid_youtube_url(url, valid):
+    assert yt_utils.is_valid_youtube_url(url) == valid
 
 
 @pytest.mark.parametrize(
@@ -113,13 +156,12 @@ def test_is_valid_youtube_url(tmp_cache_root, url, valid):
         ("not a playlist", False),
     ],
 )
-def test_is_valid_youtube_playlist(tmp_cache_root, url, valid):
-    mod = import_utils(tmp_cache_root)
-    assert mod.is_valid_youtube_playlist(url) == valid
+def test_is_valid_youtube_playlist(url, valid):
+    assert yt_utils.is_valid_youtube_playlist(url) == valid
 
 
 def test_get_audio_pcm_and_remove(tmp_cache_root):
-    mod = import_utils(tmp_cache_root)
+    mod = import_utils()
     url = "https://youtu.be/TESTVIDEOID"
     cache_dir = mod.audio_cache_dir
 
@@ -132,11 +174,98 @@ def test_get_audio_pcm_and_remove(tmp_cache_root):
     pcm_path.write_bytes(content)
 
     data = mod.get_audio_pcm(url)
-    assert isinstance(data, bytearray)
-    assert data == bytearray(content)
+    assert data is not None
+    assert bytes(memoryview(data)) == content
+    assert data[1:] == content[1:]
+    data.close()
 
     removed = mod.remove_audio_pcm(url)
     assert removed is True
     assert not pcm_path.exists()
     # Removing again
     assert not mod.remove_audio_pcm(url)
+
+
+def test_get_audio_pcm_empty_file(tmp_cache_root):
+    mod = import_utils()
+    url = "https://youtu.be/EMPTYVIDEO1"
+    filename = f"EMPTYVIDEO1_{mod.DEFAULT_SAMPLE_RATE}Hz_{mod.DEFAULT_CHANNELS}ch.pcm"
+    (mod.audio_cache_dir / filename).write_bytes(b"")
+
+    assert mod.get_audio_pcm(url) is None
+
+
+def test_filesystem_move_renames(tmp_path):
+    src = tmp_path / "a.part"
+    dst = tmp_path / "a.pcm"
+    src.write_bytes(b"pcm")
+
+    yt_utils.FilesystemBackend().move(src, dst)
+
+    assert dst.read_bytes() == b"pcm"
+    assert not src.exists()
+
+
+def test_filesystem_move_copies_across_devices(tmp_path, monkeypatch):
+    src = tmp_path / "downloading" / "a.part"
+    dst = tmp_path / "cached" / "a.pcm"
+    src.parent.mkdir()
+    dst.parent.mkdir()
+    src.write_bytes(b"pcm" * 1000)
+    dst.write_bytes(b"old")
+
+    real_replace = Path.replace
+
+    def cross_device_replace(self, target):
+        # Only the rename out of the download dir crosses a mount
+        if self == src:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_replace(self, target)
+
+    monkeypatch.setattr(Path, "replace", cross_device_replace)
+
+    yt_utils.FilesystemBackend().move(src, dst)
+
+    assert dst.read_bytes() == b"pcm" * 1000
+    assert not src.exists()
+    # No temporary copy left behind
+    assert list(dst.parent.iterdir()) == [dst]
+
+
+def test_filesystem_move_reraises_other_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        yt_utils.FilesystemBackend().move(tmp_path / "missing", tmp_path / "dst")
+
+
+def test_metadata_youtube_dl_reuses_one_client_per_thread():
+    built = []
+    closed = []
+
+    class FakeYDL:
+        def __init__(self, opts):
+            built.append(opts)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            closed.append(self)
+            return False
+
+    first = yt_utils.metadata_youtube_dl(FakeYDL)
+    assert yt_utils.metadata_youtube_dl(FakeYDL) is first
+    assert built == [yt_utils.METADATA_YDL_OPTS]
+
+    other_thread = []
+    worker = threading.Thread(
+        target=lambda: other_thread.append(yt_utils.metadata_youtube_dl(FakeYDL))
+    )
+    worker.start()
+    worker.join()
+    assert other_thread[0] is not first
+    assert closed == []
+
+    # A different factory replaces the client and closes the old one
+    replacement = yt_utils.metadata_youtube_dl(lambda opts: FakeYDL(opts))
+    assert replacement is not first
+    assert closed == [first]